@@ -1,26 +1,60 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import cv2
 import numpy as np
-import pyautogui
 import time
 import re
-import pydirectinput
 import threading
-import keyboard
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, Future
 import json
 import os
 import sys
 import logging
 import math
-from rapidocr_onnxruntime import RapidOCR
+import argparse
+import hashlib
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import OrderedDict, deque
+from functools import lru_cache
+from contextlib import contextmanager
 
-pydirectinput.PAUSE = 0.001
-pydirectinput.FAILSAFE = False
-pyautogui.FAILSAFE = False
+# cv2, the input libraries and RapidOCR take seconds to import on the onefile build,
+# so they are loaded once the window is up (or on first use): import_runtime() for
+# OCR, import_input() for game input and the screen size. pydirectinput needs
+# ctypes.windll, so keeping it out of import_runtime lets OCR, replays and the
+# simulator run on any OS.
+cv2 = pyautogui = pydirectinput = keyboard = RapidOCR = None
+runtime_lock = threading.RLock()
 
-logging.getLogger("ppocr").setLevel(logging.ERROR)
-ocr_model = RapidOCR(det_use_gpu=True, cls_use_gpu=True, rec_use_gpu=True)
+def import_runtime():
+    global cv2, RapidOCR
+    if RapidOCR is not None: return
+    with runtime_lock:
+        if RapidOCR is not None: return
+        import cv2
+        logging.getLogger("ppocr").setLevel(logging.ERROR)
+        from rapidocr_onnxruntime import RapidOCR
+
+def import_keyboard():
+    global keyboard
+    if keyboard is not None: return
+    with runtime_lock:
+        if keyboard is None: import keyboard
+
+def import_input():
+    global pyautogui, pydirectinput
+    import_keyboard()
+    if pydirectinput is not None: return
+    with runtime_lock:
+        if pydirectinput is not None: return
+        import pyautogui
+        import pydirectinput
+        pydirectinput.PAUSE = 0.001
+        pydirectinput.FAILSAFE = False
+        pyautogui.FAILSAFE = False
 
 def resource_path(relative_path):
     try:
@@ -29,11 +63,199 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+CONFIG_FILE = "ssa_settings.json"
+
+# OCR engine profiles (ocr_engine in settings: a preset name or a dict of overrides)
+# det_batch/rec_batch: frames per detection tensor and line crops per recognition
+# tensor in batched reads. Batches pay off on a GPU; on a CPU the threads already
+# cover one image and padding makes bigger batches slower.
+ENGINE_DEFAULTS = {"provider": "cpu", "intra_threads": 0, "inter_threads": 0,
+                   "graph_opt": "all", "int8": False, "use_cls": True, "det_batch": 1, "rec_batch": 6}
+ENGINE_PROFILES = {
+    "default": {},
+    "cpu_no_cls": {"use_cls": False},
+    "cpu_1_thread": {"use_cls": False, "intra_threads": 1, "inter_threads": 1},
+    "cpu_int8": {"use_cls": False, "int8": True},
+    "cuda": {"provider": "cuda", "use_cls": False, "det_batch": 8, "rec_batch": 32},
+    "directml": {"provider": "dml", "use_cls": False, "det_batch": 8, "rec_batch": 32}
+}
+DEFAULT_ENGINE_PROFILE = "default"
+GRAPH_OPT_LEVELS = {"disabled": "ORT_DISABLE_ALL", "basic": "ORT_ENABLE_BASIC",
+                    "extended": "ORT_ENABLE_EXTENDED", "all": "ORT_ENABLE_ALL"}
+PROVIDER_NAMES = {"cpu": "CPUExecutionProvider", "cuda": "CUDAExecutionProvider", "dml": "DmlExecutionProvider"}
+QUANT_MODELS_DIR = "models_int8"
+ENGINE_WARMUP_RUNS = 2
+ENGINE_LOAD_DELAY_MS = 100
+
 DEFAULT_SCAN = (0.52, 0.43, 0.08, 0.12)
 DEFAULT_BTN_NO  = (0.55, 0.54)
 DEFAULT_BTN_YES = (0.45, 0.54)
 DEFAULT_DELAY_INTERACT = 0.6
 DEFAULT_DELAY_REFRESH = 0.8
+DEFAULT_WAIT_FOR_CHANGE = False
+DEFAULT_OVERLAP_OCR = False
+
+# Adaptive delays, learned per screen resolution
+DEFAULT_ADAPTIVE_DELAYS = False
+DELAY_MIN = 0.1
+DELAY_MAX = 1.5
+DELAY_SHRINK = 0.95
+DELAY_SHRINK_AFTER = 20
+DELAY_BACKOFF = 1.3
+DELAY_FLOOR_MARGIN = 1.1
+DELAY_FLOOR_DECAY = 0.995
+
+# Screen capture
+CAPTURE_BACKENDS = ("auto", "mss", "pyautogui")
+DEFAULT_CAPTURE_BACKEND = "auto"
+CAPTURE_RING_SIZE = 4
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# OCR preprocessing. A pipeline is an ordered list of stages; each stage can be
+# switched off with "enabled": false. "ocr_pipeline" in the settings is either a
+# preset name or a custom list.
+INTERPOLATIONS = {
+    "nearest": "INTER_NEAREST",
+    "linear": "INTER_LINEAR",
+    "cubic": "INTER_CUBIC",
+    "area": "INTER_AREA",
+    "lanczos": "INTER_LANCZOS4"
+}
+PIPELINE_STAGES = ("gray", "upscale", "contrast", "binarize", "crop_text")
+PIPELINE_PRESETS = {
+    "default": [{"op": "gray"}, {"op": "upscale", "factor": 2, "interp": "cubic"}],
+    "gray_1x": [{"op": "gray"}],
+    "gray_1.5x_linear": [{"op": "gray"}, {"op": "upscale", "factor": 1.5, "interp": "linear"}],
+    "gray_2x_linear": [{"op": "gray"}, {"op": "upscale", "factor": 2, "interp": "linear"}],
+    "crop_2x": [{"op": "gray"}, {"op": "crop_text"}, {"op": "upscale", "factor": 2, "interp": "cubic"}],
+    "contrast_2x": [{"op": "gray"}, {"op": "contrast"}, {"op": "upscale", "factor": 2, "interp": "cubic"}],
+    "otsu_2x": [{"op": "gray"}, {"op": "upscale", "factor": 2, "interp": "cubic"}, {"op": "binarize"}],
+    "crop_otsu_1.5x": [{"op": "gray"}, {"op": "crop_text"}, {"op": "upscale", "factor": 1.5, "interp": "linear"}, {"op": "binarize"}]
+}
+DEFAULT_PIPELINE = "default"
+CROPS_DIR = "ocr_crops"
+
+# Recorded datasets for offline benchmarks
+DEFAULT_RECORD_DATASET = False
+DATASET_DIR = "datasets"
+DATASET_READS_FILE = "reads.jsonl"
+DATASET_MAX_FRAMES = 5000
+
+# Roll history (every roll, in SQLite)
+DEFAULT_ROLL_HISTORY = True
+HISTORY_FILE = "ssa_history.db"
+HISTORY_STAT_SCALE = 100
+HISTORY_BATCH = 500
+HISTORY_FLUSH_SECONDS = 2.0
+
+# Batched OCR (batch sizes come from the engine profile)
+OCR_BATCH_PAD = 64        # detection inputs within this many pixels share a padded batch
+OCR_BATCH_FRAMES = 16     # most frames one batched read takes from the queue
+
+# OCR worker processes (ocr_processes in settings, 0 = OCR in this process)
+DEFAULT_OCR_PROCESSES = 0
+OCR_MAX_PROCESSES = 4
+OCR_PROCESS_SLOTS = 2         # shared frame buffers per worker, so one can fill while one is read
+OCR_PROCESS_POLL = 1.0        # seconds between checks that the workers are still alive
+OCR_PROCESS_STOP_TIMEOUT = 5.0
+OCR_SETTING_KEYS = ("ocr_pipeline", "ocr_engine", "ocr_layout_cache", "ocr_glyph_fast_path", "ocr_staged_read",
+                    "ocr_line_reread")
+
+# Second look at unsure lines (ocr_line_reread in settings)
+DEFAULT_LINE_REREAD = True
+REREAD_MIN_SCORE = 0.9    # recognition score under which a line is read again
+REREAD_UPSCALE = 1.5      # on top of the pipeline's own upscale
+REREAD_PAD = 0.5          # of the line height, above and below, at most halfway to the next line
+
+# Watchdog for unattended runs (watchdog in settings); honey_amount is the budget
+DEFAULT_WATCHDOG = True
+HONEY_UNIT = 1_000_000_000_000   # honey_amount is entered in trillions
+WATCHDOG_EMPTY_STREAK = 8        # reads in a row with nothing on them
+WATCHDOG_SAME_STREAK = 8         # identical frames in a row
+WATCHDOG_WINDOW = 20             # rolls per pace sample
+WATCHDOG_SLOW_FACTOR = 3.0       # recent median roll time against the run's early one
+WATCHDOG_PAUSE = 30.0            # seconds a recovery waits before rolling again
+WATCHDOG_RECOVERIES = 2          # recoveries from one problem before the run stops
+
+# Game simulator (--capture sim)
+SIM_SCREEN = (1920, 1080)
+SIM_LATENCY = 0.0         # seconds from E or a button click until the game reacts
+SIM_CLICK_RADIUS = 0.03   # screen ratio around a button that still counts as clicking it
+SIM_BACKGROUND = (46, 32, 64)
+SIM_PASSIVE_COLOR = (255, 214, 92)
+SIM_STAT_COLOR = (255, 255, 255)
+SIM_LINE_SPACING = 1.6
+SIM_MARGIN = 0.04
+
+# Roll odds
+ROLL_COST_SINGLE = 10_000_000_000
+ROLL_COST_DOUBLE = 500_000_000_000
+STAT_SLOTS = 5                  # stats per amulet, out of STAT_RANGES
+ODDS_EXACT_BUDGET = 5_000_000   # value cells * targets the exact sum may touch
+ODDS_MC_SAMPLES = 1_000_000       # --odds
+ODDS_LIVE_MC_SAMPLES = 50_000     # the Stats panel and roll estimates, recomputed on every edit
+ODDS_MC_CHUNK = 100_000
+ODDS_MC_SEED = 1234
+ODDS_PRIOR_ROLLS = 50           # weight of the uniform prior against observed stat values
+ODDS_CALIBRATION_ROLLS = 50_000
+ODDS_MAX_ROLL_GAP = 30.0        # seconds; longer gaps between rolls are pauses, not roll time
+ODDS_CACHE_SIZE = 256
+
+# Layout cache: recognition only on remembered line bands
+DEFAULT_LAYOUT_CACHE = False
+LAYOUT_MIN_SCORE = 0.8
+LAYOUT_BAND_PAD = 0.25
+LAYOUT_SHIFT_ROWS = 6
+
+DEFAULT_STAGED_READ = False
+
+# Frame result cache
+FRAME_CACHE_SIZE = 256
+FRAME_HASH_SHIFT = 3
+FRAME_CACHE_STALL_STREAK = 5
+
+# Per-stage roll timings (Stats panel breakdown)
+TIMING_STAGES = ["press", "interact_wait", "ocr_wait", "click", "refresh_wait", "capture", "ocr_queue",
+                 "preprocess", "ocr", "parse", "reread", "match"]
+TIMING_MIN = 1e-5
+TIMING_MAX = 100.0
+TIMING_BUCKETS = 140
+TIMINGS_FILE = "ssa_timings.json"
+
+# GUI updates from worker threads are batched and drawn at this rate
+UI_FRAME_MS = 50
+UI_MAX_PENDING_LINES = 200
+
+# Glyph fast path: template matching on cached line bands before falling back to RapidOCR
+DEFAULT_GLYPH_FAST_PATH = False
+GLYPH_FILE = "glyph_templates.npz"
+GLYPH_SIZE = (16, 16)
+GLYPH_ASPECT = 1.0
+GLYPH_MIN_SCORE = 0.9
+GLYPH_MIN_MARGIN = 0.05
+NAME_SIZE = (192, 16)
+NAME_ASPECT = 12.0
+NAME_MIN_SCORE = 0.85
+NAME_MIN_MARGIN = 0.05
+GLYPH_LEARN_SCORE = 0.95
+GLYPH_MAX_SAMPLES = 200
+GLYPH_MAX_PER_LINE = 40
+GLYPH_SPACE_RATIO = 0.25
+VALUE_TOKEN_RE = re.compile(r'\s*([x\+]?\s*\d+[\.,]?\d*\s*%?)', re.IGNORECASE)
+
+# Stat parsing
+PARSE_FOLD = str.maketrans({'0': 'o', '1': 'l', 'i': 'l', '|': 'l', '!': 'l', '5': 's'})
+PARSE_DIGIT_FOLD = str.maketrans({'O': '0', 'o': '0', 'I': '1', 'l': '1'})
+PARSE_VALUE_RE = re.compile(r'[x\+]?\s*(\d(?:[\dOoIl](?=[\dOoIl.,]*(?:[\s%]|$)))*(?:[\.,]\d+)?|\d+(?:[\.,]\d+)?)\s*%?(.*)', re.IGNORECASE)
+PARSE_EDIT_CHARS = 5
+PARSE_LINE_CACHE = 4096
+
+# Frame change detection (wait for change mode)
+FRAME_SIG_SIZE = (64, 32)
+FRAME_PIXEL_DELTA = 12
+FRAME_CHANGE_RATIO = 0.002
+FRAME_POLL_INTERVAL = 0.02
+FRAME_SETTLE_POLLS = 2
 
 STAT_RANGES = {
     "Pollen (8 - 20)": (8, 20),
@@ -52,14 +274,109 @@ ALL_PASSIVES = [
     "Gummy Star", "Scorching Star", "Star Saw"
 ]
 
+def load_settings(path=CONFIG_FILE):
+    if not os.path.exists(path): return {}
+    try:
+        with open(path, 'r') as f: return json.load(f)
+    except Exception:
+        return {}
+
+def resolve_engine_profile(spec):
+    # spec: preset name or a dict of ENGINE_DEFAULTS overrides (ocr_engine in settings)
+    profile = dict(ENGINE_DEFAULTS)
+    if isinstance(spec, dict): profile.update(spec)
+    else: profile.update(ENGINE_PROFILES.get(spec, ENGINE_PROFILES[DEFAULT_ENGINE_PROFILE]))
+    return profile
+
+def quantized_model_paths(folder=QUANT_MODELS_DIR):
+    return {part: os.path.join(folder, f"{part}_int8.onnx") for part in ("det", "rec")}
+
+def engine_kwargs(profile):
+    kwargs = {"use_cls": profile["use_cls"]}
+    if profile["intra_threads"] > 0: kwargs["intra_op_num_threads"] = profile["intra_threads"]
+    if profile["inter_threads"] > 0: kwargs["inter_op_num_threads"] = profile["inter_threads"]
+    if profile["provider"] in ("cuda", "dml"):
+        for part in ("det", "cls", "rec"): kwargs[f"{part}_use_{profile['provider']}"] = True
+    if profile["int8"]:
+        paths = quantized_model_paths()
+        if all(os.path.exists(p) for p in paths.values()):
+            for part, path in paths.items(): kwargs[f"{part}_model_path"] = path
+        else:
+            logging.warning("int8 models not found in %s (run --quantize-models), using the stock ones", QUANT_MODELS_DIR)
+    return kwargs
+
+def set_graph_opt(engine, level):
+    # RapidOCR always builds its sessions with every graph optimization on;
+    # other levels mean rebuilding them with the same model, threads and providers
+    import onnxruntime as ort
+    for holder in (engine.text_det.infer, engine.text_cls.infer, engine.text_rec.session):
+        old = holder.session
+        opts = ort.SessionOptions()
+        current = old.get_session_options()
+        opts.log_severity_level = current.log_severity_level
+        opts.enable_cpu_mem_arena = current.enable_cpu_mem_arena
+        opts.intra_op_num_threads = current.intra_op_num_threads
+        opts.inter_op_num_threads = current.inter_op_num_threads
+        opts.graph_optimization_level = getattr(ort.GraphOptimizationLevel, GRAPH_OPT_LEVELS[level])
+        holder.session = ort.InferenceSession(old._model_path, sess_options=opts, providers=old.get_providers())
+
+def create_ocr_engine(spec=DEFAULT_ENGINE_PROFILE):
+    import_runtime()
+    profile = resolve_engine_profile(spec)
+    engine = RapidOCR(**engine_kwargs(profile))
+    if profile["graph_opt"] != "all": set_graph_opt(engine, profile["graph_opt"])
+    engine.det_batch = profile["det_batch"]
+    engine.text_rec.rec_batch_num = profile["rec_batch"]
+    return engine
+
+def warmup_engine(engine):
+    # First inferences pay for allocator and kernel setup; run them on a dummy panel
+    img = np.zeros((120, 320, 3), dtype=np.uint8)
+    cv2.putText(img, "+25% White Pollen", (8, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2, cv2.LINE_AA)
+    cv2.putText(img, "Pop Star", (8, 95), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2, cv2.LINE_AA)
+    for _ in range(ENGINE_WARMUP_RUNS): engine(img)
+
+ocr_model = None
+ocr_engine_spec = None
+# In this process the engine, layout cache and glyph classifier serve one read at a
+# time, so F3 during a run waits for the roll's read instead of racing it
+ocr_lock = threading.Lock()
+# Resolves to the first warmed up engine; F1 and F3 wait on it. Failures stay on it.
+engine_ready = Future()
+
+def set_ocr_engine(spec):
+    # The running engine is only replaced once the new one is warmed up, so a
+    # failed load keeps the previous one. The swap waits for any read in progress.
+    global ocr_model, ocr_engine_spec
+    with runtime_lock:
+        engine = create_ocr_engine(spec)
+        warmup_engine(engine)
+        with ocr_lock:
+            ocr_model, ocr_engine_spec = engine, spec
+            with layout_cache.lock: layout_cache.invalidate()
+    return engine
+
+def load_runtime(spec=None):
+    # Heavy imports plus the first engine (ocr_engine from settings unless given); runs once
+    with runtime_lock:
+        if not engine_ready.done():
+            try:
+                if spec is None: spec = load_settings().get("ocr_engine", DEFAULT_ENGINE_PROFILE)
+                engine_ready.set_result(set_ocr_engine(spec))
+            except Exception as e:
+                engine_ready.set_exception(e)
+    return engine_ready.result()
+
 running = False
 
 def get_screen_rect(ratio_tuple):
+    import_input()
     sw, sh = pyautogui.size()
     rx, ry, rw, rh = ratio_tuple
     return (int(sw * rx), int(sh * ry), int(sw * rw), int(sh * rh))
 
 def get_screen_point(ratio_tuple):
+    import_input()
     sw, sh = pyautogui.size()
     rx, ry = ratio_tuple
     return (int(sw * rx), int(sh * ry))
@@ -74,74 +391,1163 @@ def wiggle_click(ratio_coords):
     time.sleep(0.05) 
     pydirectinput.mouseUp()
 
+class CaptureSession:
+    # Frames are written into a small ring of reused buffers instead of allocating per
+    # grab. A returned frame stays valid until ring_size more grabs have been made.
+    def __init__(self, ring_size=CAPTURE_RING_SIZE):
+        self.ring_size = ring_size
+        self.ring = []
+        self.ring_pos = 0
+        self.screen_size = None
+
+    def query_screen_size(self):
+        import_input()
+        return pyautogui.size()
+
+    def get_screen_size(self):
+        if self.screen_size is None:
+            self.screen_size = tuple(self.query_screen_size())
+        return self.screen_size
+
+    def rect_to_pixels(self, scan_rect):
+        sw, sh = self.get_screen_size()
+        rx, ry, rw, rh = scan_rect
+        return (int(sw * rx), int(sh * ry), max(1, int(sw * rw)), max(1, int(sh * rh)))
+
+    def next_buffer(self, h, w):
+        if not self.ring or self.ring[0].shape[:2] != (h, w):
+            self.ring = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(self.ring_size)]
+            self.ring_pos = 0
+        buf = self.ring[self.ring_pos]
+        self.ring_pos = (self.ring_pos + 1) % self.ring_size
+        return buf
+
+    def grab(self, scan_rect):
+        x, y, w, h = self.rect_to_pixels(scan_rect)
+        buf = self.next_buffer(h, w)
+        self.grab_into(x, y, w, h, buf)
+        return buf
+
+    def grab_into(self, x, y, w, h, buf):
+        raise NotImplementedError
+
+    def close(self):
+        self.ring = []
+
+class PyAutoGuiCapture(CaptureSession):
+    name = "pyautogui"
+
+    def __init__(self, ring_size=CAPTURE_RING_SIZE):
+        import_input()
+        super().__init__(ring_size)
+
+    def grab_into(self, x, y, w, h, buf):
+        shot = pyautogui.screenshot(region=(x, y, w, h))
+        np.copyto(buf, np.asarray(shot)[:, :, :3])
+
+class MssCapture(CaptureSession):
+    name = "mss"
+
+    def __init__(self, ring_size=CAPTURE_RING_SIZE):
+        import mss
+        super().__init__(ring_size)
+        self.mss = mss
+        # mss handles are tied to the thread that opened them (F3 runs on its own thread)
+        self.local = threading.local()
+        self.sessions = []
+        monitor = self.get_sct().monitors[1]
+        self.origin = (monitor["left"], monitor["top"])
+        self.screen_size = (monitor["width"], monitor["height"])
+
+    def get_sct(self):
+        sct = getattr(self.local, "sct", None)
+        if sct is None:
+            sct = self.mss.mss()
+            self.local.sct = sct
+            self.sessions.append(sct)
+        return sct
+
+    def grab_into(self, x, y, w, h, buf):
+        ox, oy = self.origin
+        shot = self.get_sct().grab({"left": ox + x, "top": oy + y, "width": w, "height": h})
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(h, w, 4)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=buf)
+
+    def close(self):
+        for sct in self.sessions:
+            try: sct.close()
+            except Exception: pass
+        self.sessions = []
+        super().close()
+
+class ReplayCapture(CaptureSession):
+    # Plays back saved frames (a folder of images or a single image) in a loop so the
+    # roll loop can run headless. Frames are scan rect crops unless full_screen is set,
+    # in which case they are treated as whole screenshots and cropped like the screen.
+    name = "replay"
+
+    def __init__(self, source, full_screen=False, ring_size=CAPTURE_RING_SIZE):
+        super().__init__(ring_size)
+        self.full_screen = full_screen
+        self.frames = [f for f in (load_rgb_image(p) for p in list_image_files(source)) if f is not None]
+        if not self.frames:
+            raise FileNotFoundError(f"No replay frames found in {source}")
+        self.frame_index = 0
+        h, w = self.frames[0].shape[:2]
+        self.screen_size = (w, h)
+
+    def grab(self, scan_rect):
+        frame = self.frames[self.frame_index]
+        self.frame_index = (self.frame_index + 1) % len(self.frames)
+        if self.full_screen:
+            x, y, w, h = self.rect_to_pixels(scan_rect)
+            frame = frame[y:y + h, x:x + w]
+        h, w = frame.shape[:2]
+        buf = self.next_buffer(h, w)
+        np.copyto(buf, frame)
+        return buf
+
+class GameSimulator:
+    # Stand-in for the amulet generator, so the whole roll loop runs without the game.
+    # E opens the dialog and Yes/No (at the settings' button positions) rolls a new
+    # amulet, which SimCapture draws into the scan rect; both take `latency` seconds,
+    # so delays that are too short read the old amulet just like in the game.
+    # Amulet n depends only on the seed, n and whether it was a double roll, so a
+    # seed reproduces every frame. Options (the "simulator" block in the settings):
+    # seed, latency, screen, stat_skew {stat: exponent, >1 favours low values},
+    # passive_weights {passive: weight}, font_path (a .ttf, drawn with Pillow; the
+    # default is OpenCV's Hershey Duplex), noise (pixel sigma), jitter (pixels) and
+    # honey (in trillions; once it can't pay for a roll, clicks do nothing).
+    def __init__(self, seed=0, latency=SIM_LATENCY, screen=SIM_SCREEN, btn_yes=DEFAULT_BTN_YES, btn_no=DEFAULT_BTN_NO,
+                 stat_skew=None, passive_weights=None, font_path=None, noise=0.0, jitter=0, honey=None):
+        self.seed = seed
+        self.latency = latency
+        self.screen = tuple(screen)
+        self.buttons = {True: tuple(btn_yes), False: tuple(btn_no)}
+        self.stat_skew = stat_skew or {}
+        weights = np.array([float((passive_weights or {}).get(p, 1.0)) for p in ALL_PASSIVES])
+        self.passive_p = weights / weights.sum()
+        self.font_path = font_path
+        self.noise = noise
+        self.jitter = jitter
+        self.honey = None if honey is None else honey * HONEY_UNIT
+        self.lock = threading.Lock()
+        self.dialog_at = None     # when the dialog opened (or will)
+        self.shown = (0, False)   # (amulet index, double) on screen
+        self.pending = None       # ((index, double), visible at)
+        self.rolls = 0
+        self.spent = 0
+        self.ignored_clicks = 0
+        self.rendered = {}
+
+    @classmethod
+    def from_settings(cls, settings, seed=None):
+        opts = dict(settings.get("simulator", {}))
+        btns = settings.get("btn_coords", {})
+        if seed is not None: opts["seed"] = seed
+        return cls(btn_yes=btns.get("yes", DEFAULT_BTN_YES), btn_no=btns.get("no", DEFAULT_BTN_NO), **opts)
+
+    def amulet(self, index, double=False):
+        # -> (passives, stats) of amulet `index`
+        rng = np.random.default_rng([self.seed, index, int(double)])
+        passives = [str(p) for p in rng.choice(ALL_PASSIVES, 2 if double else 1, replace=False, p=self.passive_p)]
+        stats = {}
+        for j in sorted(rng.choice(len(STAT_KEYS), STAT_SLOTS, replace=False)):
+            stat = STAT_KEYS[j]
+            values = STAT_VALUES[stat]
+            u = rng.random() ** self.stat_skew.get(stat, 1.0)
+            # Each shown value is equally likely (at skew 1), the ends included
+            value = float(values[min(int(u * len(values)), len(values) - 1)])
+            stats[stat] = value if STAT_RANGES[stat][1] < 2 else int(value)
+        return passives, stats
+
+    def lines(self, index, double=False):
+        passives, stats = self.amulet(index, double)
+        text = [(p, SIM_PASSIVE_COLOR) for p in passives]
+        for stat, value in stats.items():
+            name = stat.split('(')[0].strip()
+            text.append((f"x{value:.2f} {name}" if STAT_RANGES[stat][1] < 2 else f"+{value}% {name}", SIM_STAT_COLOR))
+        return text
+
+    def press(self, key):
+        if key != 'e': return
+        with self.lock:
+            if self.dialog_at is None: self.dialog_at = time.time() + self.latency
+
+    def click(self, ratio_coords):
+        now = time.time()
+        with self.lock:
+            for double, (bx, by) in self.buttons.items():
+                if abs(ratio_coords[0] - bx) <= SIM_CLICK_RADIUS and abs(ratio_coords[1] - by) <= SIM_CLICK_RADIUS:
+                    break
+            else:
+                double = None
+            cost = ROLL_COST_DOUBLE if double else ROLL_COST_SINGLE
+            if double is None or self.dialog_at is None or now < self.dialog_at or \
+                    (self.honey is not None and self.spent + cost > self.honey):
+                self.ignored_clicks += 1
+                return
+            self.visible(now)
+            self.rolls += 1
+            self.spent += cost
+            self.pending = ((self.rolls, double), now + self.latency)
+            self.dialog_at = None
+
+    def latest(self):
+        # -> (index, double) of the last amulet rolled, shown yet or not
+        with self.lock: return self.pending[0] if self.pending else self.shown
+
+    def visible(self, now=None):
+        # -> (index, double) of the amulet on screen; call with the lock held
+        if self.pending and (now or time.time()) >= self.pending[1]:
+            self.shown, self.pending = self.pending[0], None
+        return self.shown
+
+    def render(self, w, h):
+        with self.lock: key = (*self.visible(), w, h)
+        img = self.rendered.get(key)
+        if img is None:
+            if len(self.rendered) > 8: self.rendered.clear()
+            img = self.rendered[key] = self.draw(key[0], key[1], w, h)
+        return img
+
+    def draw(self, index, double, w, h):
+        rng = np.random.default_rng([self.seed, index, int(double), 1])
+        lines = self.lines(index, double)
+        img = np.empty((h, w, 3), dtype=np.uint8)
+        img[:] = SIM_BACKGROUND
+        margin = int(w * SIM_MARGIN)
+        dx, dy = rng.integers(-self.jitter, self.jitter + 1, size=2) if self.jitter else (0, 0)
+        line_h = h / (len(lines) * SIM_LINE_SPACING + 0.5)
+        if self.font_path:
+            from PIL import Image, ImageDraw, ImageFont
+            font = ImageFont.truetype(self.font_path, max(6, int(line_h)))
+            widest = max(font.getlength(text) for text, _ in lines)
+            if widest > w - 2 * margin:
+                font = ImageFont.truetype(self.font_path, max(6, int(line_h * (w - 2 * margin) / widest)))
+            canvas = Image.fromarray(img)
+            draw = ImageDraw.Draw(canvas)
+            for i, (text, color) in enumerate(lines):
+                draw.text((margin + dx, int(line_h * (0.5 + i * SIM_LINE_SPACING)) + dy), text, fill=color, font=font)
+            img = np.asarray(canvas).copy()
+        else:
+            font = cv2.FONT_HERSHEY_DUPLEX
+            (tw, th), _ = cv2.getTextSize(max((t for t, _ in lines), key=len), font, 1.0, 1)
+            scale = min((w - 2 * margin) / tw, line_h / th)
+            thickness = max(1, int(round(scale * 1.5)))
+            for i, (text, color) in enumerate(lines):
+                y = int(line_h * (0.5 + i * SIM_LINE_SPACING) + th * scale) + dy
+                cv2.putText(img, text, (margin + dx, y), font, scale, color, thickness, cv2.LINE_AA)
+        if self.noise:
+            img = np.clip(img + rng.normal(0, self.noise, img.shape), 0, 255).astype(np.uint8)
+        return img
+
+    def export(self, folder, count, w, h, double=False):
+        # Writes amulets 1..count as PNGs with a labels.json, for --bench and --bench-pipelines
+        os.makedirs(folder, exist_ok=True)
+        labels = {}
+        for index in range(1, count + 1):
+            name = f"sim_{self.seed}_{index:05d}.png"
+            cv2.imwrite(os.path.join(folder, name), cv2.cvtColor(self.draw(index, double, w, h), cv2.COLOR_RGB2BGR))
+            passives, stats = self.amulet(index, double)
+            labels[name] = {"passives": passives, "stats": stats}
+        with open(os.path.join(folder, "labels.json"), 'w') as f: json.dump(labels, f, indent=1)
+        return folder
+
+class SimCapture(CaptureSession):
+    # Frames drawn by a GameSimulator at the scan rect's size
+    name = "sim"
+
+    def __init__(self, simulator, ring_size=CAPTURE_RING_SIZE):
+        super().__init__(ring_size)
+        self.simulator = simulator
+        self.screen_size = simulator.screen
+
+    def grab_into(self, x, y, w, h, buf):
+        np.copyto(buf, self.simulator.render(w, h))
+
+def list_image_files(source):
+    if os.path.isfile(source): return [source]
+    if not os.path.isdir(source): return []
+    return [os.path.join(source, f) for f in sorted(os.listdir(source))
+            if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+def load_rgb_image(path):
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None: return None
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+def create_capture(backend=DEFAULT_CAPTURE_BACKEND, source=None):
+    if backend == "replay":
+        return ReplayCapture(source)
+    if backend in ("auto", "mss"):
+        try:
+            return MssCapture()
+        except Exception:
+            if backend == "mss": raise
+    return PyAutoGuiCapture()
+
+capture = None
+capture_backend = None
+
+def set_capture_backend(backend=DEFAULT_CAPTURE_BACKEND, source=None):
+    global capture, capture_backend
+    new_capture = create_capture(backend, source)
+    old_capture, capture = capture, new_capture
+    capture_backend = backend
+    if old_capture: old_capture.close()
+    return new_capture
+
+def ensure_capture(backend=DEFAULT_CAPTURE_BACKEND):
+    if capture is None or capture_backend != backend:
+        set_capture_backend(backend)
+    return capture
+
+class StageTimer:
+    # Streaming latency histograms per roll stage. Buckets are log spaced, so
+    # percentiles are accurate to about one bucket width without keeping samples.
+    def __init__(self):
+        self.edges = np.geomspace(TIMING_MIN, TIMING_MAX, TIMING_BUCKETS + 1)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+            self.totals = {}
+            self.maxima = {}
+
+    def record(self, stage, seconds):
+        i = min(max(int(np.searchsorted(self.edges, seconds)) - 1, 0), TIMING_BUCKETS - 1)
+        with self.lock:
+            if stage not in self.counts:
+                self.counts[stage] = np.zeros(TIMING_BUCKETS, dtype=np.int64)
+                self.totals[stage] = 0.0
+                self.maxima[stage] = 0.0
+            self.counts[stage][i] += 1
+            self.totals[stage] += seconds
+            self.maxima[stage] = max(self.maxima[stage], seconds)
+        if not hasattr(self.local, "spans"): self.local.spans = {}
+        self.local.spans[stage] = seconds
+
+    def take_spans(self):
+        # Spans recorded on this thread since the last call, for per-roll history.
+        # The loop and the OCR worker each get their own.
+        spans = getattr(self.local, "spans", {})
+        self.local.spans = {}
+        return spans
+
+    def add_spans(self, spans):
+        # Credits spans timed on another thread (the shared OCR reader) to this one
+        if not hasattr(self.local, "spans"): self.local.spans = {}
+        self.local.spans.update(spans)
+
+    @contextmanager
+    def span(self, stage):
+        t0 = time.perf_counter()
+        try: yield
+        finally: self.record(stage, time.perf_counter() - t0)
+
+    def percentile(self, stage, q):
+        # Upper edge of the bucket holding the q-th sample, capped at the slowest sample
+        counts = self.counts[stage]
+        i = int(np.searchsorted(np.cumsum(counts), q / 100 * counts.sum()))
+        return min(self.edges[min(i, TIMING_BUCKETS - 1) + 1], self.maxima[stage])
+
+    def summary(self):
+        # -> {stage: {"count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"}}, in TIMING_STAGES order
+        with self.lock:
+            stages = [s for s in TIMING_STAGES if s in self.counts] + [s for s in self.counts if s not in TIMING_STAGES]
+            out = {}
+            for s in stages:
+                n = int(self.counts[s].sum())
+                out[s] = {"count": n, "mean_ms": self.totals[s] * 1000 / n,
+                          **{f"p{q}_ms": self.percentile(s, q) * 1000 for q in (50, 90, 99)},
+                          "max_ms": self.maxima[s] * 1000}
+            return out
+
+    def dump(self, path=TIMINGS_FILE):
+        with open(path, 'w') as f: json.dump(self.summary(), f, indent=4)
+        return path
+
+stage_timer = StageTimer()
+
 def get_stats_image_dynamic(scan_rect):
-    x, y, w, h = get_screen_rect(scan_rect)
-    return np.array(pyautogui.screenshot(region=(x, y, w, h)))
+    if capture is None: set_capture_backend()
+    return capture.grab(scan_rect)
+
+def frame_signature(img):
+    small = cv2.resize(img, FRAME_SIG_SIZE, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3: small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    return small.astype(np.int16)
+
+def frames_differ(sig_a, sig_b):
+    changed = np.count_nonzero(np.abs(sig_a - sig_b) > FRAME_PIXEL_DELTA)
+    return changed > sig_a.size * FRAME_CHANGE_RATIO
+
+def wait_for_frame_settle(scan_rect, baseline_sig, timeout, grab=None):
+    # Poll until the panel differs from the pre-click frame and then holds still.
+    # timeout is the old fixed delay, so this is never slower than sleeping it out.
+    deadline = time.time() + timeout
+    changed = baseline_sig is None
+    prev_sig = None
+    stable = 0
+    grab = grab or get_stats_image_dynamic
+    while True:
+        img = grab(scan_rect)
+        sig = frame_signature(img)
+        if not changed:
+            changed = frames_differ(sig, baseline_sig)
+        elif prev_sig is not None and not frames_differ(sig, prev_sig):
+            stable += 1
+            if stable >= FRAME_SETTLE_POLLS: return img
+        else:
+            stable = 0
+        prev_sig = sig
+        if time.time() >= deadline: return img
+        time.sleep(FRAME_POLL_INTERVAL)
+
+def text_mask(gray):
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Text is the minority class; flip light backgrounds so text is always the set pixels
+    if cv2.countNonZero(mask) > mask.size // 2: mask = cv2.bitwise_not(mask)
+    return mask
+
+def text_bounds(gray, pad):
+    mask = text_mask(gray)
+    points = cv2.findNonZero(mask)
+    h, w = gray.shape[:2]
+    if points is None: return 0, 0, w, h
+    x, y, bw, bh = cv2.boundingRect(points)
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    return x0, y0, min(w, x + bw + pad) - x0, min(h, y + bh + pad) - y0
+
+def to_gray(img):
+    if img.ndim == 3: return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    return img
+
+def resolve_pipeline(spec):
+    if spec is None: return PIPELINE_PRESETS[DEFAULT_PIPELINE]
+    if isinstance(spec, str): return PIPELINE_PRESETS.get(spec, PIPELINE_PRESETS[DEFAULT_PIPELINE])
+    return [stage for stage in spec if stage.get("op") in PIPELINE_STAGES]
+
+def preprocess_frame(img, pipeline=None):
+    # Returns the processed image and (scale, ox, oy), which maps a point in the
+    # processed image back to the capture: x = px / scale + ox
+    stages = resolve_pipeline(ocr_pipeline if pipeline is None else pipeline)
+    scale, ox, oy = 1.0, 0.0, 0.0
+    for stage in stages:
+        if not stage.get("enabled", True): continue
+        op = stage["op"]
+        if op == "gray":
+            img = to_gray(img)
+        elif op == "upscale":
+            factor = stage.get("factor", 2)
+            if factor == 1: continue
+            interp = getattr(cv2, INTERPOLATIONS.get(stage.get("interp", "cubic"), "INTER_CUBIC"))
+            img = cv2.resize(img, None, fx=factor, fy=factor, interpolation=interp)
+            scale *= factor
+        elif op == "contrast":
+            gray = to_gray(img)
+            lo, hi = np.percentile(gray, (stage.get("low", 2), stage.get("high", 98)))
+            if hi - lo < 1: continue
+            alpha = 255.0 / (hi - lo)
+            img = cv2.convertScaleAbs(gray, alpha=alpha, beta=-lo * alpha)
+        elif op == "binarize":
+            gray = to_gray(img)
+            if stage.get("method", "otsu") == "adaptive":
+                img = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                            stage.get("block", 31) | 1, stage.get("c", 10))
+            else:
+                _, img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        elif op == "crop_text":
+            x, y, w, h = text_bounds(to_gray(img), stage.get("pad", 4))
+            img = img[y:y + h, x:x + w]
+            ox += x / scale
+            oy += y / scale
+    return img, (scale, ox, oy)
 
-def ocr_process(img):
+ocr_pipeline = DEFAULT_PIPELINE
+
+def set_ocr_pipeline(spec):
+    global ocr_pipeline
+    ocr_pipeline = spec if spec else DEFAULT_PIPELINE
+
+def ocr_process(img, pipeline=None, passive_gate=None):
     if img is None: return ""
-    img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return "".join(text + "\n" for _, text, _ in ocr_process_lines(img, pipeline, passive_gate)[0])
+
+def ocr_process_lines(img, pipeline=None, passive_gate=None, layout=None):
+    # -> ([(box, text, score)], (scale, ox, oy)); boxes are in the processed image
+    with stage_timer.span("preprocess"):
+        img, transform = preprocess_frame(img, pipeline)
+    with stage_timer.span("ocr"):
+        return ocr_lines(img, passive_gate, layout), transform
+
+def as_bgr(img):
+    if img.ndim == 2: return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+def points_to_box(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return (int(min(xs)), int(min(ys)), int(math.ceil(max(xs))), int(math.ceil(max(ys))))
+
+def ink_rows(mask):
+    return np.count_nonzero(mask, axis=1) > max(2, mask.shape[1] // 100)
+
+def ink_span(mask, pad):
+    cols = np.flatnonzero(mask.any(axis=0))
+    if cols.size == 0: return 0, mask.shape[1]
+    return max(0, cols[0] - pad), min(mask.shape[1], cols[-1] + 1 + pad)
+
+class TemplateBank:
+    # One averaged, normalised template per label, matched by correlation
+    def __init__(self, size, aspect):
+        self.size = size
+        self.aspect = aspect
+        self.sums = {}
+        self.counts = {}
+        self.labels = []
+        self.matrix = None
+
+    def vectors(self, images):
+        out = np.empty((len(images), self.size[0] * self.size[1]), dtype=np.float32)
+        for i, img in enumerate(images):
+            # Left-align on a fixed-aspect canvas first; stretching straight to the
+            # template size would hide width, which is what tells '1' from '4'
+            h, w = img.shape[:2]
+            canvas = np.zeros((h, max(w, int(h * self.aspect))), dtype=np.uint8)
+            canvas[:, :w] = img
+            out[i] = cv2.resize(canvas, self.size, interpolation=cv2.INTER_AREA).ravel() / 255.0
+        out -= out.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return out / norms
+
+    def add(self, labels, images):
+        changed = False
+        for label, vec in zip(labels, self.vectors(images)):
+            if self.counts.get(label, 0) >= GLYPH_MAX_SAMPLES: continue
+            self.sums[label] = self.sums.get(label, 0) + vec
+            self.counts[label] = self.counts.get(label, 0) + 1
+            changed = True
+        if changed: self.rebuild()
+        return changed
+
+    def rebuild(self):
+        labels = sorted(self.sums)
+        if len(labels) < 2:
+            self.labels, self.matrix = labels, None
+            return
+        matrix = np.stack([self.sums[k] / self.counts[k] for k in labels])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.labels, self.matrix = labels, matrix / norms
+
+    def match(self, images, min_score, min_margin):
+        labels, matrix = self.labels, self.matrix
+        if matrix is None or not images: return None
+        sims = self.vectors(images) @ matrix.T
+        best = sims.argmax(axis=1)
+        top = sims[np.arange(len(images)), best]
+        second = np.partition(sims, -2, axis=1)[:, -2]
+        if top.min() < min_score or (top - second).min() < min_margin: return None
+        return [labels[i] for i in best], float(top.min())
+
+    def state(self, prefix):
+        labels = sorted(self.sums)
+        if not labels: return {}
+        return {f"{prefix}_labels": np.array(labels),
+                f"{prefix}_sums": np.stack([self.sums[k] for k in labels]),
+                f"{prefix}_counts": np.array([self.counts[k] for k in labels])}
+
+    def restore(self, data, prefix):
+        if f"{prefix}_labels" not in data: return
+        labels = [str(k) for k in data[f"{prefix}_labels"]]
+        self.sums = dict(zip(labels, data[f"{prefix}_sums"]))
+        self.counts = {k: int(n) for k, n in zip(labels, data[f"{prefix}_counts"])}
+        self.rebuild()
+
+class GlyphClassifier:
+    # Fast path for the panel's fixed vocabulary. A line is split into words on wide
+    # gaps; a stat line is read as value glyphs ('+', 'x', digits, '.', '%') followed by
+    # a whole-word match of the stat name, a passive line as one whole-word match.
+    # Templates are learned from lines RapidOCR read confidently. A read is only
+    # trusted when every match clears its score and margin limits and the result
+    # parses; anything else goes back to RapidOCR.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.glyphs = TemplateBank(GLYPH_SIZE, GLYPH_ASPECT)
+        self.names = TemplateBank(NAME_SIZE, NAME_ASPECT)
+        self.dirty = False
+        self.reads = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def segment(mask):
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0: return None, [], []
+        mask = mask[rows[0]:rows[-1] + 1]
+        cols = np.concatenate(([False], mask.any(axis=0), [False]))
+        edges = np.flatnonzero(cols[1:] != cols[:-1])
+        spans = list(zip(edges[::2], edges[1::2]))
+        space_gap = mask.shape[0] * GLYPH_SPACE_RATIO
+        words = [[spans[0]]] if spans else []
+        for prev, span in zip(spans, spans[1:]):
+            if span[0] - prev[1] > space_gap: words.append([span])
+            else: words[-1].append(span)
+        return mask, spans, words
+
+    def learn(self, mask, text):
+        mask, spans, words = self.segment(mask)
+        if not words: return False
+        passives, stats = parse_stats(text)
+        changed = False
+        with self.lock:
+            if passives and not stats and len(passives) == 1:
+                changed = self.names.add(passives, [mask[:, spans[0][0]:spans[-1][1]]])
+            elif len(stats) == 1 and not passives and len(words) >= 2:
+                value = VALUE_TOKEN_RE.match(text)
+                value_chars = value.group(1).replace(" ", "") if value else ""
+                # Touching or broken glyphs make the count disagree; just skip those
+                if value_chars and len(value_chars) == len(words[0]):
+                    changed |= self.glyphs.add(list(value_chars), [mask[:, x0:x1] for x0, x1 in words[0]])
+                name_start = words[1][0][0]
+                changed |= self.names.add(list(stats), [mask[:, name_start:spans[-1][1]]])
+            if changed: self.dirty = True
+        return changed
+
+    def read(self, mask):
+        mask, spans, words = self.segment(mask)
+        if not words or len(spans) > GLYPH_MAX_PER_LINE: return None
+
+        text = None
+        if len(words) >= 2:
+            value = self.glyphs.match([mask[:, x0:x1] for x0, x1 in words[0]], GLYPH_MIN_SCORE, GLYPH_MIN_MARGIN)
+            name = self.names.match([mask[:, words[1][0][0]:spans[-1][1]]], NAME_MIN_SCORE, NAME_MIN_MARGIN)
+            if value and name and name[0][0] in STAT_RANGES:
+                text = "".join(value[0]) + " " + name[0][0].split('(')[0].strip()
+                score = min(value[1], name[1])
+        if text is None:
+            name = self.names.match([mask[:, spans[0][0]:spans[-1][1]]], NAME_MIN_SCORE, NAME_MIN_MARGIN)
+            if name and name[0][0] in ALL_PASSIVES:
+                text, score = name[0][0], name[1]
+
+        if text is None or not any(parse_stats(text)):
+            self.fallbacks += 1
+            return None
+        self.reads += 1
+        return text, score
+
+    def save(self, path=GLYPH_FILE):
+        with self.lock:
+            state = {**self.glyphs.state("glyph"), **self.names.state("name")}
+            if not state: return
+            np.savez_compressed(path, **state)
+            self.dirty = False
+
+    def load(self, path=GLYPH_FILE):
+        if not os.path.exists(path): return False
+        try:
+            data = np.load(path)
+            with self.lock:
+                self.glyphs.restore(data, "glyph")
+                self.names.restore(data, "name")
+                self.dirty = False
+            return True
+        except Exception:
+            return False
+
+glyph_classifier = GlyphClassifier()
+glyph_fast_path = DEFAULT_GLYPH_FAST_PATH
+
+def set_glyph_fast_path(enabled):
+    global glyph_fast_path
+    glyph_fast_path = enabled
+    if enabled and glyph_classifier.names.matrix is None: glyph_classifier.load()
+
+def learn_glyphs(mask, lines):
+    for (x0, y0, x1, y1), text, score in lines:
+        if score >= GLYPH_LEARN_SCORE:
+            glyph_classifier.learn(mask[y0:y1, x0:x1], text)
+
+class LayoutCache:
+    # Remembers where the text lines of the panel are so later rolls can skip the
+    # detection model and run recognition on those bands only. Any sign the layout
+    # moved (new ink outside the bands, an empty or unsure line) drops the cache and
+    # the next read does a full detection again.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.invalidate()
+        self.hits = 0
+        self.detections = 0
+        self.rejections = 0
+
+    def invalidate(self):
+        self.shape = None
+        self.bands = []
+        self.covered = None
+        self.base_outside = 0
+        self.passive_bands = []
+
+    def learn(self, img, lines):
+        if not lines:
+            self.invalidate()
+            return
+        h, w = img.shape[:2]
+        bands = []
+        band_texts = []
+        for (x0, y0, x1, y1), text, _ in sorted(lines, key=lambda l: l[0][1]):
+            # Boxes whose vertical centre falls inside the previous band are the same line
+            if bands and (y0 + y1) / 2 <= bands[-1][1]:
+                bands[-1][1] = max(bands[-1][1], y1)
+                band_texts[-1] += " " + text
+                continue
+            bands.append([y0, y1])
+            band_texts.append(text)
+
+        padded = []
+        for i, (y0, y1) in enumerate(bands):
+            pad = int((y1 - y0) * LAYOUT_BAND_PAD)
+            top = max(0, y0 - pad)
+            bottom = min(h, y1 + pad)
+            if i > 0: top = max(top, (bands[i - 1][1] + y0) // 2)
+            if i < len(bands) - 1: bottom = min(bottom, (y1 + bands[i + 1][0]) // 2 + 1)
+            padded.append((top, bottom))
+
+        covered = np.zeros(h, dtype=bool)
+        for top, bottom in padded: covered[top:bottom] = True
+        self.shape = (h, w)
+        self.bands = padded
+        self.covered = covered
+        self.base_outside = int(np.count_nonzero(ink_rows(text_mask(to_gray(img))) & ~covered))
+        self.passive_bands = []
+        for i, text in enumerate(band_texts):
+            passives, stats = parse_stats(text)
+            if passives and not stats: self.passive_bands.append(i)
+        self.detections += 1
+
+    def read(self, img, passive_gate=None):
+        if self.shape != img.shape[:2] or not self.bands: return None
+        mask = text_mask(to_gray(img))
+        outside = np.count_nonzero(ink_rows(mask) & ~self.covered)
+        if outside > self.base_outside + LAYOUT_SHIFT_ROWS:
+            self.invalidate()
+            return None
+
+        # Line widths change from roll to roll, so each band is trimmed to its ink
+        boxes = []
+        for top, bottom in self.bands:
+            x0, x1 = ink_span(mask[top:bottom], (bottom - top) // 2)
+            boxes.append((x0, top, x1, bottom))
+
+        order = list(range(len(boxes)))
+        if passive_gate and self.passive_bands:
+            # Staged read: passives first, and stop there when no target can use them
+            lines = self.read_bands(img, mask, boxes, self.passive_bands)
+            if lines is None: return None
+            passives, _ = parse_stats("".join(text + "\n" for _, text, _ in lines))
+            if passives and not passive_gate(passives):
+                self.hits += 1
+                self.rejections += 1
+                return lines
+            rest = [i for i in order if i not in self.passive_bands]
+            more = self.read_bands(img, mask, boxes, rest)
+            if more is None: return None
+            by_band = dict(zip(self.passive_bands, lines))
+            by_band.update(zip(rest, more))
+            lines = [by_band[i] for i in order]
+        else:
+            lines = self.read_bands(img, mask, boxes, order)
+            if lines is None: return None
+        self.hits += 1
+        return lines
+
+    def read_bands(self, img, mask, boxes, indices):
+        results = {}
+        if glyph_fast_path:
+            for i in indices:
+                x0, y0, x1, y1 = boxes[i]
+                read = glyph_classifier.read(mask[y0:y1, x0:x1])
+                if read: results[i] = read
+
+        pending = [i for i in indices if i not in results]
+        if pending:
+            crops = [as_bgr(img[y0:y1, x0:x1]) for x0, y0, x1, y1 in (boxes[i] for i in pending)]
+            try:
+                rec_res, _ = ocr_model.text_rec(crops)
+            except Exception:
+                self.invalidate()
+                return None
+            for i, res in zip(pending, rec_res):
+                results[i] = (res[0].strip(), float(res[1]))
+
+        lines = []
+        for i in indices:
+            text, score = results[i]
+            if not text or score < LAYOUT_MIN_SCORE:
+                self.invalidate()
+                return None
+            lines.append((boxes[i], text, score))
+        if glyph_fast_path and pending:
+            learn_glyphs(mask, [line for i, line in zip(indices, lines) if i in pending])
+        return lines
+
+layout_cache = LayoutCache()
+layout_cache_enabled = DEFAULT_LAYOUT_CACHE
+
+def set_layout_cache(enabled):
+    global layout_cache_enabled
+    layout_cache_enabled = enabled
+    layout_cache.invalidate()
+
+staged_read = DEFAULT_STAGED_READ
+
+def set_staged_read(enabled):
+    global staged_read
+    staged_read = enabled
+
+def ocr_lines(img, passive_gate=None, layout=None):
+    # -> [(box, text, score)], box = (x0, y0, x1, y1) in the processed image.
+    # passive_gate(passives) says whether the stat lines are worth reading; it is
+    # only used for staged reads on a cached layout. layout is the LayoutCache to use
+    # (a session's own under a SessionScheduler), layout_cache by default.
+    layout = layout or layout_cache
+    if layout_cache_enabled:
+        with layout.lock:
+            lines = layout.read(img, passive_gate if staged_read else None)
+        if lines is not None: return lines
+
+    lines = ocr_full(img)
+    remember_lines(img, lines, layout)
+    return lines
+
+def ocr_full(img):
+    # One whole-image ocr_model call -> [(box, text, score)]
     try:
         result, _ = ocr_model(img) 
     except Exception:
-        return ""
+        return []
     
-    full_text = ""
+    lines = []
     if result:
         for item in result:
-            if len(item) >= 2:
-                full_text += item[1] + "\n"
-    return full_text
+            if len(item) >= 3:
+                lines.append((points_to_box(item[0]), item[1], float(item[2])))
+    return lines
 
-def parse_stats(text):
-    passives = []
-    stats = {}
-    stat_map = {}
-    for k in STAT_RANGES.keys():
-        clean_name = k.split('(')[0].replace(" ", "").lower()
-        stat_map[clean_name] = k
-
-    passive_map = {p.replace(" ", "").lower(): p for p in ALL_PASSIVES}
-    
-    # Sort by length
-    sorted_stat_keys = sorted(stat_map.keys(), key=len, reverse=True)
+def remember_lines(img, lines, layout=None):
+    # A full read teaches the layout cache and the glyph classifier
+    layout = layout or layout_cache
+    if layout_cache_enabled:
+        with layout.lock:
+            layout.learn(img, lines)
+    if glyph_fast_path and lines:
+        learn_glyphs(text_mask(to_gray(img)), lines)
 
-    lines = text.split('\n')
-    for line in lines:
-        if not line.strip(): continue
-        line_clean = line.lower().replace(" ", "").replace(":", "").replace(".", "")
-        
-        # Check Passives
-        for clean_p, real_p in passive_map.items():
-            if clean_p in line_clean:
-                passives.append(real_p)
-        
-        # Check Stats
-        match = re.search(r'[x\+]?\s*(\d+[\.,]?\d*)(.*)', line, re.IGNORECASE)
+# ocr_batch drives RapidOCR internals (the version is pinned in the README). If they
+# change under it, batches fall back to one ocr_model call per image from then on.
+ocr_batch_broken = False
+
+def set_ocr_batch_broken():
+    global ocr_batch_broken
+    ocr_batch_broken = True
+    logging.exception("Batched OCR failed, reading one image at a time from now on")
+
+def ocr_lines_batch(images, passive_gates=None, layouts=None):
+    # ocr_lines for many processed images; whatever the layout caches can't serve is
+    # read with one ocr_batch
+    gates = passive_gates or [None] * len(images)
+    layouts = [layout or layout_cache for layout in (layouts or [None] * len(images))]
+    results = [None] * len(images)
+    if layout_cache_enabled:
+        for i, (img, gate, layout) in enumerate(zip(images, gates, layouts)):
+            with layout.lock:
+                results[i] = layout.read(img, gate if staged_read else None)
+    todo = [i for i, lines in enumerate(results) if lines is None]
+    if todo:
+        batch = None
+        if not ocr_batch_broken:
+            try: batch = ocr_batch([images[i] for i in todo])
+            except Exception: set_ocr_batch_broken()
+        if batch is None: batch = [ocr_full(images[i]) for i in todo]
+        for i, lines in zip(todo, batch):
+            remember_lines(images[i], lines, layouts[i])
+            results[i] = lines
+    return results
+
+def run_ocr(img, passive_gate=None):
+    return "".join(text + "\n" for _, text, _ in ocr_lines(img, passive_gate))
+
+line_reread = DEFAULT_LINE_REREAD
+
+def set_line_reread(enabled):
+    global line_reread
+    line_reread = enabled
+
+def reread_lines(img, lines, doubts, transform):
+    # Second look at the lines parse_lines doubted. Boxes on the same row as a doubted
+    # line are part of it (detection sometimes splits one), so the whole row is cut
+    # from the capture, full width and padded up to halfway to its neighbours, upscaled
+    # past the pipeline's factor and recognised as one line. The row becomes a single
+    # line with whichever reading line_quality prefers: the new one or the old boxes joined.
+    scale, ox, oy = transform
+    h = img.shape[0]
+    spans = [(box[1] / scale + oy, box[3] / scale + oy) for box, _, _ in lines]
+    rows = []
+    for i in doubts:
+        if any(i in members for members, _, _ in rows): continue
+        y0, y1 = spans[i]
+        members = [j for j, (a, b) in enumerate(spans) if y0 <= (a + b) / 2 <= y1 or a <= (y0 + y1) / 2 <= b]
+        top, bottom = min(spans[j][0] for j in members), max(spans[j][1] for j in members)
+        pad = (bottom - top) * REREAD_PAD
+        top = max([top - pad] + [(top + b) / 2 for j, (a, b) in enumerate(spans) if j not in members and b <= top])
+        bottom = min([bottom + pad] + [(bottom + a) / 2 for j, (a, b) in enumerate(spans) if j not in members and a >= bottom])
+        top, bottom = max(0, int(top)), min(h, int(math.ceil(bottom)))
+        if bottom - top >= 2: rows.append((members, top, bottom))
+    if not rows: return lines
+    factor = scale * REREAD_UPSCALE
+    crops = [cv2.resize(to_gray(img[top:bottom]), None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+             for _, top, bottom in rows]
+    try: reads = recognize_batch(crops)
+    except Exception: return lines
+    replaced = {}
+    for (members, _, _), (text, score) in zip(rows, reads):
+        row = sorted((lines[j] for j in members), key=lambda l: l[0][0])
+        box = (min(b[0] for b, _, _ in row), min(b[1] for b, _, _ in row),
+               max(b[2] for b, _, _ in row), max(b[3] for b, _, _ in row))
+        old = (" ".join(t for _, t, _ in row), min(sc for _, _, sc in row))
+        best = max(old, (text, score), key=lambda read: stat_parser.line_quality(*read))
+        replaced[members[0]] = (box, *best)
+        for j in members[1:]: replaced[j] = None
+    return [replaced.get(j, line) for j, line in enumerate(lines) if replaced.get(j, line) is not None]
+
+def recognize_batch(crops):
+    # Recognition only, over many line crops at once -> [(text, score)], in crop
+    # order. RapidOCR's text_rec sorts the crops by aspect ratio before cutting them
+    # into rec_batch tensors, so similar lines from different frames share a tensor.
+    if not crops: return []
+    rec_res, _ = ocr_model.text_rec([as_bgr(c) for c in crops])
+    return [(res[0].strip(), float(res[1])) for res in rec_res]
+
+def ocr_batch(images):
+    # ocr_model(img) for many processed images at once -> [[(box, text, score)], ...].
+    # Detection inputs of about the same size are padded to one shape and run as a
+    # single tensor, det_batch at a time; the line crops of every image then go
+    # through the angle classifier and recognition together.
+    engine = ocr_model
+    det = engine.text_det
+    prepared = []
+    for img in images:
+        img = engine.load_img(img)
+        raw_h, raw_w = img.shape[:2]
+        img, ratio_h, ratio_w = engine.preprocess(img)
+        img, op_record = engine.maybe_add_letterbox(img, {"preprocess": {"ratio_h": ratio_h, "ratio_w": ratio_w}})
+        prepared.append((img, op_record, raw_h, raw_w, det.get_preprocess(max(img.shape[:2]))(img)))
+
+    boxes = [None] * len(prepared)
+    order = sorted(range(len(prepared)), key=lambda i: prepared[i][4].shape[2:])
+    while order:
+        h0, w0 = prepared[order[0]][4].shape[2:]
+        group = [i for i in order[:getattr(engine, "det_batch", 1)]
+                 if prepared[i][4].shape[2] - h0 <= OCR_BATCH_PAD and prepared[i][4].shape[3] - w0 <= OCR_BATCH_PAD]
+        order = [i for i in order if i not in group]
+        height = max(prepared[i][4].shape[2] for i in group)
+        width = max(prepared[i][4].shape[3] for i in group)
+        # Edge padding continues the background, so it adds no text
+        tensor = np.concatenate([np.pad(prepared[i][4], ((0, 0), (0, 0), (0, height - prepared[i][4].shape[2]),
+                                                         (0, width - prepared[i][4].shape[3])), mode="edge")
+                                 for i in group])
+        preds = det.infer(tensor)[0]
+        for k, i in enumerate(group):
+            img, t = prepared[i][0], prepared[i][4]
+            found, _ = det.postprocess_op(preds[k:k + 1, :, :t.shape[2], :t.shape[3]], img.shape[:2])
+            found = det.filter_tag_det_res(found, img.shape[:2])
+            boxes[i] = engine.sorted_boxes(found) if len(found) else []
+
+    crops, owners = [], []
+    for i, (img, *_rest) in enumerate(prepared):
+        if boxes[i]:
+            crops += engine.get_crop_img_list(img, boxes[i])
+            owners += [i] * len(boxes[i])
+    if crops and engine.use_cls:
+        crops, _, _ = engine.text_cls(crops)
+    texts = recognize_batch(crops)
+
+    results = [[] for _ in prepared]
+    per_image = {}
+    for i, read in zip(owners, texts): per_image.setdefault(i, []).append(read)
+    for i, reads in per_image.items():
+        _, op_record, raw_h, raw_w, _ = prepared[i]
+        origin = engine._get_origin_points(boxes[i], op_record, raw_h, raw_w)
+        results[i] = [(points_to_box(box), text, score) for box, (text, score) in zip(origin, reads)
+                      if score >= engine.text_score]
+    return results
+
+def fold_name(text):
+    # Lower-case letters only, with the usual OCR look-alikes folded together
+    # (both stat names and OCR lines go through this, so "lnstant" == "Instant")
+    return re.sub(r'[^a-z]', '', text.lower().translate(PARSE_FOLD))
+
+class NameTrie:
+    def __init__(self, names):
+        self.root = {}
+        for key, value in names.items():
+            node = self.root
+            for ch in key: node = node.setdefault(ch, {})
+            node[None] = value
+
+    def longest_at(self, text, start):
+        # Longest name starting at text[start] -> (name, length), (None, 0) if none
+        best, best_len = None, 0
+        node = self.root
+        for end in range(start, len(text)):
+            node = node.get(text[end])
+            if node is None: break
+            if None in node: best, best_len = node[None], end - start + 1
+        return best, best_len
+
+    def longest_in(self, text):
+        # Longest name contained anywhere in text
+        best, best_len = None, 0
+        for start in range(len(text)):
+            name, length = self.longest_at(text, start)
+            if length > best_len: best, best_len = name, length
+        return best
+
+    def all_in(self, text):
+        # Every name in text, left to right without overlaps (the longest one at each start)
+        found, start = [], 0
+        while start < len(text):
+            name, length = self.longest_at(text, start)
+            if name is None:
+                start += 1
+                continue
+            found.append(name)
+            start += length
+        return found
+
+    def nearest(self, word, max_edits):
+        # Levenshtein search down the trie, pruning branches whose row minimum
+        # already exceeds max_edits. Ties between different names are ambiguous.
+        found = {}
+        stack = [(self.root, list(range(len(word) + 1)))]
+        while stack:
+            node, row = stack.pop()
+            for ch, child in node.items():
+                if ch is None: continue
+                new = [row[0] + 1]
+                for j in range(1, len(word) + 1):
+                    new.append(min(new[j - 1] + 1, row[j] + 1, row[j - 1] + (word[j - 1] != ch)))
+                if None in child and new[-1] <= max_edits:
+                    found[child[None]] = min(found.get(child[None], new[-1]), new[-1])
+                if min(new) <= max_edits: stack.append((child, new))
+        if not found: return None
+        best = min(found.values())
+        hits = [v for v, d in found.items() if d == best]
+        return hits[0] if len(hits) == 1 else None
+
+class StatParser:
+    # Built once: stat and passive names go into tries, and parsed lines are memoised
+    # since the same panel lines come back roll after roll.
+    def __init__(self, stat_ranges=STAT_RANGES, passives=ALL_PASSIVES):
+        self.stat_ranges = stat_ranges
+        self.stats = NameTrie({fold_name(k.split('(')[0]): k for k in stat_ranges})
+        self.passives = NameTrie({fold_name(p): p for p in passives})
+        self.parse_line = lru_cache(maxsize=PARSE_LINE_CACHE)(self._parse_line)
+
+    def lookup(self, trie, name):
+        # Whole-line fuzzy match first so "Rd Pollen" isn't read as plain "Pollen",
+        # then any name inside the line for reads with junk around the name
+        if not name: return None
+        found = trie.nearest(name, max(1, len(name) // PARSE_EDIT_CHARS))
+        return found if found is not None else trie.longest_in(name)
+
+    def lookup_all(self, trie, name):
+        # lookup() for a line that may hold several names, e.g. two passives the OCR
+        # merged into one line: the whole-line match, else every name inside the line
+        if not name: return ()
+        found = trie.nearest(name, max(1, len(name) // PARSE_EDIT_CHARS))
+        if found is not None: return (found,)
+        return tuple(dict.fromkeys(trie.all_in(name)))
+
+    def normalize_value(self, raw, stat):
+        # OCR drops or invents decimal points and reads "%" as a digit; pick the
+        # reading that lands inside the stat's range
+        lo, hi = self.stat_ranges[stat]
+        raw = raw.replace(',', '.').translate(PARSE_DIGIT_FOLD)
+        val = float(raw)
+        if lo <= val <= hi: return val
+        digits = raw.replace('.', '')
+        if float(lo).is_integer() and float(hi).is_integer():
+            candidates = [float(digits[:n]) for n in range(len(digits), 0, -1)]
+        else:
+            candidates = [float(digits[:n] + '.' + digits[n:]) for n in range(1, len(digits))]
+        for c in candidates:
+            if lo <= c <= hi: return c
+        if val < lo: return val
+        logging.warning("Dropping out of range read %s for %s", raw, stat)
+        return None
+
+    def _parse_line(self, line):
+        # -> (passives, stat, value). Passives the OCR merged into a stat line are
+        # picked up before the value and around the stat name; a line without a stat
+        # can hold several passives.
+        match = PARSE_VALUE_RE.search(line)
         if match:
-            val_str = match.group(1).replace(',', '.')
-            rest_of_line = match.group(2)
-            clean_rest = rest_of_line.lower().replace(" ", "").replace("%", "")
-            
-            found_stat_name = None
-            for k in sorted_stat_keys:
-                if k in clean_rest:
-                    found_stat_name = stat_map[k]
-                    break
-            
-            if found_stat_name:
+            rest = fold_name(match.group(2))
+            stat = self.lookup(self.stats, rest)
+            if stat is not None:
+                name = fold_name(stat.split('(')[0])
+                at = rest.find(name)
+                outside = [fold_name(line[:match.start()])]
+                if at >= 0: outside += [rest[:at], rest[at + len(name):]]
+                passives = tuple(dict.fromkeys(p for part in outside for p in self.passives.all_in(part)))
                 try:
-                    val = float(val_str)
-                    min_r, max_r = STAT_RANGES[found_stat_name]
-                    if val > 100 and max_r < 100: val = val // 10
-                    if max_r < 20 and val > 20: val = val // 10
-                    if found_stat_name == "Convert Rate" and val > 10: val = val / 100
-                    
-                    stats[found_stat_name] = val
+                    return passives, stat, self.normalize_value(match.group(1), stat)
                 except ValueError:
-                    continue
-    return list(set(passives)), stats
+                    return passives, None, None
+        return self.lookup_all(self.passives, fold_name(line)), None, None
+
+    def parse(self, text):
+        passives, stats, _ = self.parse_lines([(None, line, 1.0) for line in text.split('\n')])
+        return passives, stats
+
+    def parse_lines(self, lines):
+        # parse() over OCR lines [(box, text, score)], also returning the indices of
+        # the lines worth a second look (line_doubt)
+        passives = []
+        stats = {}
+        doubts = []
+        for i, (_, line, score) in enumerate(lines):
+            if not line.strip(): continue
+            found, stat, val = self.parse_line(line)
+            passives += [p for p in found if p not in passives]
+            if stat is not None and val is not None: stats[stat] = val
+            if self.doubt(stat, val, score): doubts.append(i)
+        return passives, stats, doubts
+
+    def doubt(self, stat, val, score):
+        # "range" for a stat whose value was dropped or is outside STAT_RANGES,
+        # "score" for a recognition score under REREAD_MIN_SCORE, else None
+        if stat is not None:
+            lo, hi = self.stat_ranges[stat]
+            if val is None or not lo <= val <= hi: return "range"
+        if score < REREAD_MIN_SCORE: return "score"
+        return None
+
+    def line_quality(self, line, score):
+        # Orders readings of one panel line: one that parses to a passive or an
+        # in-range stat beats one that doesn't, then the higher score wins
+        found, stat, val = self.parse_line(line)
+        return bool(found) or (stat is not None and self.doubt(stat, val, 1.0) is None), score
+
+stat_parser = StatParser()
+
+def parse_stats(text):
+    return stat_parser.parse(text)
 
 def format_time(seconds):
     if seconds is None or seconds == float('inf') or seconds == 0: return "--"
@@ -158,14 +1564,507 @@ def format_large_number(num):
     if num >= 1e9:  return f"{num/1e9:.2f} B"
     return f"{num:.0f}"
 
-def run_debug_test(log_main, log_raw, get_scan_rect):
+STAT_KEYS = list(STAT_RANGES)
+STAT_INDEX = {k: i for i, k in enumerate(STAT_KEYS)}
+# Every value a stat can show: sub-2 ranges (Convert Rate) are multipliers with two
+# decimals, the rest whole percents
+STAT_VALUES = {k: np.round(np.linspace(lo, hi, int(round((hi - lo) / (0.01 if hi < 2 else 1))) + 1), 2)
+               for k, (lo, hi) in STAT_RANGES.items()}
+PASSIVE_BITS = {p: 1 << i for i, p in enumerate(ALL_PASSIVES)}
+
+def passive_mask(passives):
+    mask = 0
+    for p in passives: mask |= PASSIVE_BITS.get(p, 0)
+    return mask
+
+def stat_vector(stats):
+    # Missing stats are NaN, which fails every >= comparison
+    vals = np.full(len(STAT_KEYS), np.nan)
+    for k, v in stats.items():
+        j = STAT_INDEX.get(k)
+        if j is not None: vals[j] = v
+    return vals
+
+class TargetMatcher:
+    # Targets compiled once into passive bitmasks and a threshold matrix over the
+    # STAT_KEYS columns, so a roll is checked against every target in one comparison.
+    # A stat that is wanted with a minimum of 0 only has to be present.
+    def __init__(self, targets):
+        n, cols = len(targets), len(STAT_KEYS)
+        self.targets = targets
+        self.passive_masks = np.array([passive_mask(t['passives']) for t in targets], dtype=np.int64)
+        self.required = np.zeros((n, cols), dtype=bool)
+        self.thresholds = np.full((n, cols), -np.inf)
+        self.possible = np.ones(n, dtype=bool)
+        for i, t in enumerate(targets):
+            if any(p not in PASSIVE_BITS for p in t['passives']): self.possible[i] = False
+            for s, req_v in t['stats'].items():
+                j = STAT_INDEX.get(s)
+                if j is None:
+                    self.possible[i] = False
+                    continue
+                self.required[i, j] = True
+                if req_v > 0: self.thresholds[i, j] = req_v
+
+    def match_batch(self, passive_masks, values):
+        # passive_masks: (N,) ints, values: (N, len(STAT_KEYS)) with NaN for missing.
+        # Returns an (N, targets) bool matrix.
+        passive_masks = np.asarray(passive_masks, dtype=np.int64)[:, None]
+        passive_ok = (passive_masks & self.passive_masks) == self.passive_masks
+        meets = np.asarray(values)[:, None, :] >= self.thresholds
+        stat_ok = np.all(meets | ~self.required, axis=2)
+        return passive_ok & stat_ok & self.possible
+
+    def match_all(self, detected_passives, detected_stats):
+        pm = passive_mask(detected_passives)
+        passive_ok = (self.passive_masks & pm) == self.passive_masks
+        meets = stat_vector(detected_stats) >= self.thresholds
+        stat_ok = np.all(meets | ~self.required, axis=1)
+        return np.flatnonzero(passive_ok & stat_ok & self.possible)
+
+    def passives_can_match(self, detected_passives):
+        pm = passive_mask(detected_passives)
+        return bool(np.any(((self.passive_masks & pm) == self.passive_masks) & self.possible))
+
+def frame_hash(img):
+    # Exact on purpose: a hit hands back another frame's stats, and rolls that differ
+    # by one digit ("+17%" vs "+18%") look alike to a perceptual hash (a 64-bit dHash
+    # of a simulated panel didn't change at all). A frame with a blinking cursor or
+    # particles over it just misses and is read again, costing one OCR call.
+    small = cv2.resize(to_gray(img), None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    # Dropping the low bits absorbs most small colour jitter; a changed digit still
+    # changes the key at half resolution
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(small.shape, dtype=np.int32).tobytes())
+    digest.update((small >> FRAME_HASH_SHIFT).tobytes())
+    return digest.digest()
+
+class FrameResultCache:
+    # LRU of (raw_text, passives, stats) keyed by frame hash. Identical frames (a click
+    # that didn't register, a lagging dialog, repeated F3) skip OCR entirely, and a long
+    # hit_streak means the game has stopped producing new rolls.
+    def __init__(self, capacity=FRAME_CACHE_SIZE):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.hit_streak = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                self.hit_streak = 0
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.hit_streak += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+frame_cache = FrameResultCache()
+
+def read_frame(img, passive_gate=None, cache=None):
+    # Gated reads may stop after the passives, so they are only reused by gated reads.
+    # The cache is cleared on every start, as the gate depends on the targets; rollers
+    # with different targets each need their own.
+    cache = cache or frame_cache
+    key = (frame_hash(img), passive_gate is not None)
+    cached = cache.get(key)
+    if cached: return cached
+    result = read_image(img, passive_gate)
+    cache.put(key, result)
+    return result
+
+def read_image(img, passive_gate=None, layout=None):
+    # read_frame without the cache
+    with ocr_lock:
+        lines, transform = ocr_process_lines(img, passive_gate=passive_gate, layout=layout)
+    with stage_timer.span("parse"):
+        passives, stats, doubts = stat_parser.parse_lines(lines)
+    if doubts and line_reread:
+        lines, passives, stats = reread_frame_lines(img, lines, doubts, transform)
+    return ("".join(text + "\n" for _, text, _ in lines), passives, stats)
+
+def reread_frame_lines(img, lines, doubts, transform):
+    # -> (lines, passives, stats) after reread_lines, timed as the reread stage
+    with stage_timer.span("reread"):
+        with ocr_lock:
+            lines = reread_lines(img, lines, doubts, transform)
+        passives, stats, _ = stat_parser.parse_lines(lines)
+    return lines, passives, stats
+
+def read_frames(items):
+    # read_frame for many (img, passive_gate, cache, layout) at once -> [(raw_text, passives, stats)].
+    # Each frame is credited an equal share of the batch's preprocess, OCR and parse
+    # time; rereads are timed per frame.
+    results = [None] * len(items)
+    todo = []
+    for i, (img, passive_gate, cache, _) in enumerate(items):
+        cache = cache or frame_cache
+        key = (frame_hash(img), passive_gate is not None)
+        results[i] = cache.get(key)
+        if not results[i]: todo.append((i, key, cache))
+    if not todo: return results
+    with ocr_lock:
+        t0 = time.perf_counter()
+        processed = [preprocess_frame(items[i][0]) for i, _, _ in todo]
+        t1 = time.perf_counter()
+        batch = ocr_lines_batch([img for img, _ in processed], [items[i][1] for i, _, _ in todo],
+                                [items[i][3] for i, _, _ in todo])
+        t2 = time.perf_counter()
+    parsed = [stat_parser.parse_lines(lines) for lines in batch]
+    t3 = time.perf_counter()
+    for stage, seconds in (("preprocess", t1 - t0), ("ocr", t2 - t1), ("parse", t3 - t2)):
+        for _ in todo: stage_timer.record(stage, seconds / len(todo))
+    for (i, key, cache), lines, (_, transform), (passives, stats, doubts) in zip(todo, batch, processed, parsed):
+        if doubts and line_reread:
+            lines, passives, stats = reread_frame_lines(items[i][0], lines, doubts, transform)
+        results[i] = ("".join(text + "\n" for _, text, _ in lines), passives, stats)
+        cache.put(key, results[i])
+    return results
+
+def evaluate_roll(stats_img, matcher, reader=read_frame):
+    raw_text, detected_passives, detected_stats = reader(stats_img, matcher.passives_can_match)
+    with stage_timer.span("match"):
+        hits = matcher.match_all(detected_passives, detected_stats)
+    return raw_text, detected_passives, detected_stats, [int(i) for i in hits]
+
+def screen_key(size=None):
+    # Key for per-resolution settings; size defaults to the real screen's
+    if size is None:
+        import_input()
+        size = pyautogui.size()
+    sw, sh = size
+    return f"{sw}x{sh}"
+
+class DelayTuner:
+    # Adaptive delays: after every DELAY_SHRINK_AFTER clean rolls one delay (taking
+    # turns) is shortened; a roll that looks read too early backs off the delay it
+    # points at and puts a floor just above the failing value, so the delays settle
+    # at the fastest timing that still reads. Floors slowly decay to retry lower.
+    #   nothing read -> the menu wasn't open yet: interact
+    #   same frame as last roll, or fewer lines than usual -> panel not refreshed: refresh
+    def __init__(self, interact, refresh):
+        self.delays = {"interact": interact, "refresh": refresh}
+        self.floors = {"interact": DELAY_MIN, "refresh": DELAY_MIN}
+        self.clean = 0
+        self.turn = 0
+        self.last_key = None
+        self.expected_stats = 0
+
+    @property
+    def interact(self): return self.delays["interact"]
+
+    @property
+    def refresh(self): return self.delays["refresh"]
+
+    def observe(self, frame_key, passives, stats, gated=False):
+        # gated: a staged read skipped the stats on purpose. Returns the delay backed off, if any
+        if not passives and not stats: blame = "interact"
+        elif frame_key == self.last_key: blame = "refresh"
+        elif not passives or (not gated and len(stats) < self.expected_stats): blame = "refresh"
+        else: blame = None
+        self.last_key = frame_key
+        if blame is None:
+            if not gated: self.expected_stats = max(self.expected_stats, len(stats))
+            self.clean += 1
+            if self.clean >= DELAY_SHRINK_AFTER:
+                self.clean = 0
+                name = ("interact", "refresh")[self.turn]
+                self.turn ^= 1
+                self.floors[name] = max(DELAY_MIN, self.floors[name] * DELAY_FLOOR_DECAY)
+                self.delays[name] = max(self.floors[name], self.delays[name] * DELAY_SHRINK)
+            return None
+        self.clean = 0
+        current = self.delays[blame]
+        self.floors[blame] = min(DELAY_MAX, max(self.floors[blame], current * DELAY_FLOOR_MARGIN))
+        self.delays[blame] = min(DELAY_MAX, max(current * DELAY_BACKOFF, self.floors[blame]))
+        return blame
+
+def parse_honey(text):
+    # honey_amount (trillions, as typed) -> honey; unreadable counts as none
+    try: return max(0.0, float(text)) * HONEY_UNIT
+    except (TypeError, ValueError): return 0.0
+
+class RollWatchdog:
+    # Catches the ways an unattended run keeps going without getting anywhere:
+    #   the next roll would spend past the honey budget -> stop before it (budget)
+    #   WATCHDOG_EMPTY_STREAK reads in a row with nothing on them -> the dialog isn't
+    #     opening or the OCR area moved (no_reads)
+    #   WATCHDOG_SAME_STREAK identical frames in a row -> rolls aren't going through,
+    #     e.g. out of honey or the click misses the button (not_rolling)
+    #   the median of the last WATCHDOG_WINDOW roll times is WATCHDOG_SLOW_FACTOR times
+    #     the run's first one -> the game or the PC is lagging (slow)
+    # RollerEngine answers a stuck state with a recovery (a pause, and a fresh layout)
+    # and stops the run after WATCHDOG_RECOVERIES of them for the same problem. A clean
+    # read, or a window of rolls back at the usual pace for slow, resets the count.
+    def __init__(self, budget, cost_per_roll):
+        self.budget = budget
+        self.cost_per_roll = cost_per_roll
+        self.empty = 0
+        self.same = 0
+        self.last_key = None
+        self.durations = deque(maxlen=WATCHDOG_WINDOW)
+        self.baseline = None
+        self.recoveries = {}
+        self.problem = None
+
+    def can_afford(self, spent):
+        return not self.budget or spent + self.cost_per_roll <= self.budget
+
+    def observe_read(self, frame_key, passives, stats):
+        if not passives and not stats:
+            self.empty += 1
+        elif frame_key == self.last_key:
+            self.same += 1
+        else:
+            self.empty = self.same = 0
+            self.recoveries.pop("no_reads", None)
+            self.recoveries.pop("not_rolling", None)
+        self.last_key = frame_key
+        if self.empty >= WATCHDOG_EMPTY_STREAK:
+            self.flag("no_reads", f"{self.empty} rolls in a row read nothing (the dialog isn't opening, or the OCR area moved)")
+        elif self.same >= WATCHDOG_SAME_STREAK:
+            self.flag("not_rolling", f"the same amulet {self.same + 1} times in a row "
+                                     f"(out of honey, or the generate click misses the button)")
+
+    def observe_roll(self, seconds):
+        self.durations.append(seconds)
+        if len(self.durations) < WATCHDOG_WINDOW: return
+        pace = float(np.median(self.durations))
+        if self.baseline is None:
+            self.baseline = pace
+        elif pace > self.baseline * WATCHDOG_SLOW_FACTOR:
+            self.flag("slow", f"rolls slowed to {pace:.1f}s from {self.baseline:.1f}s")
+        else:
+            self.recoveries.pop("slow", None)
+            return
+        self.durations.clear()
+
+    def flag(self, problem, message):
+        self.problem = (problem, message)
+        self.empty = self.same = 0
+
+    def take_problem(self):
+        # -> (problem, message, recoveries so far including this one) or None
+        if self.problem is None: return None
+        (problem, message), self.problem = self.problem, None
+        self.recoveries[problem] = self.recoveries.get(problem, 0) + 1
+        return problem, message, self.recoveries[problem]
+
+def save_crop(img, folder=CROPS_DIR):
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S") + f"_{int(time.time() * 1000) % 1000:03d}"
+    path = os.path.join(folder, f"{stamp}.png")
+    cv2.imwrite(path, cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+    return path
+
+def stat_column(stat):
+    return "s_" + re.sub(r'\W+', '_', stat.split('(')[0].strip().lower())
+
+class RollHistory:
+    # Append-only SQLite store of every roll. Rows are queued by the roller and
+    # written in batches by a background thread, so the roll loop never waits on
+    # disk. To keep multi-day files small, passives are a bitmask (PASSIVE_BITS),
+    # stats are integers scaled by HISTORY_STAT_SCALE and timings are integer
+    # microseconds; SQLite stores all of them as short varints. Missing stats or
+    # timings are NULL.
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.stat_columns = {k: stat_column(k) for k in STAT_KEYS}
+        self.time_columns = {s: f"t_{s}" for s in TIMING_STAGES}
+        self.columns = (["session", "roll", "ts", "passives", "hits"] +
+                        list(self.stat_columns.values()) + list(self.time_columns.values()))
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, started INTEGER, "
+                       "double INTEGER, targets TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS rolls (id INTEGER PRIMARY KEY, session INTEGER, "
+                       "roll INTEGER, ts INTEGER, passives INTEGER, hits TEXT)")
+            existing = {row[1] for row in db.execute("PRAGMA table_info(rolls)")}
+            for col in self.columns:
+                if col in existing: continue
+                try: db.execute(f"ALTER TABLE rolls ADD COLUMN {col} INTEGER")
+                except sqlite3.OperationalError: pass  # another roller added it first
+            db.execute("CREATE INDEX IF NOT EXISTS rolls_session ON rolls (session)")
+        self.insert_sql = f"INSERT INTO rolls ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})"
+        self.rows = queue.Queue()
+        self.writer = None
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def start_session(self, targets, double):
+        with self.connect() as db:
+            cur = db.execute("INSERT INTO sessions (started, double, targets) VALUES (?, ?, ?)",
+                             (int(time.time() * 1000), int(double), json.dumps(targets)))
+            session = cur.lastrowid
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop)
+            self.writer.daemon = True
+            self.writer.start()
+        return session
+
+    def append(self, session, roll, ts, passives, stats, hits, spans):
+        # spans: {stage: seconds}
+        row = [session, roll, int(ts * 1000), passive_mask(passives), ",".join(map(str, hits)) or None]
+        row += [round(stats[k] * HISTORY_STAT_SCALE) if k in stats else None for k in self.stat_columns]
+        row += [round(spans[s] * 1e6) if s in spans else None for s in self.time_columns]
+        self.rows.put(row)
+
+    def write_loop(self):
+        db = self.connect()
+        done = False
+        while not done:
+            batch = []
+            try:
+                row = self.rows.get(timeout=HISTORY_FLUSH_SECONDS)
+                while row is not None:
+                    batch.append(row)
+                    if len(batch) >= HISTORY_BATCH: break
+                    row = self.rows.get_nowait()
+                done = row is None
+            except queue.Empty:
+                pass
+            if batch:
+                try:
+                    with db: db.executemany(self.insert_sql, batch)
+                except sqlite3.Error:
+                    logging.exception("Roll history write failed, %d rows dropped", len(batch))
+        db.close()
+
+    def close(self):
+        # Flushes everything queued so far
+        if self.writer:
+            self.rows.put(None)
+            self.writer.join()
+            self.writer = None
+
+    # Queries. session=None covers every session.
+    def where(self, session):
+        return ("WHERE session = ?", (session,)) if session is not None else ("", ())
+
+    def sessions(self):
+        with self.connect() as db:
+            return [{"id": i, "started": started / 1000, "double": bool(double), "targets": json.loads(targets)}
+                    for i, started, double, targets in db.execute("SELECT id, started, double, targets FROM sessions ORDER BY id")]
+
+    def summary(self, session=None):
+        clause, args = self.where(session)
+        with self.connect() as db:
+            rolls, hits, first, last = db.execute(
+                f"SELECT COUNT(*), COUNT(hits), MIN(ts), MAX(ts) FROM rolls {clause}", args).fetchone()
+        hours = (last - first) / 3_600_000 if rolls > 1 else 0
+        return {"rolls": rolls, "hits": hits,
+                "first": first / 1000 if first else None, "last": last / 1000 if last else None,
+                "rolls_per_hour": rolls / hours if hours else None}
+
+    def passive_frequencies(self, session=None):
+        clause, args = self.where(session)
+        with self.connect() as db:
+            rows = db.execute(f"SELECT passives, COUNT(*) FROM rolls {clause} GROUP BY passives", args).fetchall()
+        total = sum(n for _, n in rows)
+        return {p: sum(n for mask, n in rows if mask & bit) / total for p, bit in PASSIVE_BITS.items()} if total else {}
+
+    def stat_values(self, stat, session=None):
+        # -> float array over rolls, NaN where the stat wasn't on the amulet
+        clause, args = self.where(session)
+        with self.connect() as db:
+            rows = db.execute(f"SELECT {self.stat_columns[stat]} FROM rolls {clause}", args).fetchall()
+        return np.array([np.nan if v is None else v / HISTORY_STAT_SCALE for v, in rows])
+
+    def recent_rolls(self, limit):
+        # -> (timestamps in seconds, (N, len(STAT_KEYS)) values with NaN for missing), oldest first
+        cols = ", ".join(self.stat_columns.values())
+        with self.connect() as db:
+            rows = db.execute(f"SELECT ts, {cols} FROM rolls ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        data = np.array(rows[::-1], dtype=float).reshape(-1, len(STAT_KEYS) + 1)
+        return data[:, 0] / 1000, data[:, 1:] / HISTORY_STAT_SCALE
+
+    def stage_times(self, stage, session=None):
+        # -> milliseconds for every roll that timed this stage
+        clause, args = self.where(session)
+        col = self.time_columns[stage]
+        clause = f"{clause} AND {col} IS NOT NULL" if clause else f"WHERE {col} IS NOT NULL"
+        with self.connect() as db:
+            rows = db.execute(f"SELECT {col} FROM rolls {clause}", args).fetchall()
+        return np.array([v / 1000 for v, in rows])
+
+class DatasetRecorder:
+    # Saves every roll's scan rect frame with the raw OCR text and parsed read to
+    # datasets/<session>/ for replaying through --bench. Repeated frames are stored
+    # once, and PNG encoding and file writes run on a background thread.
+    def __init__(self, root=DATASET_DIR, max_frames=DATASET_MAX_FRAMES):
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        self.folder = os.path.join(root, stamp)
+        suffix = 1
+        while True:
+            try:
+                os.makedirs(self.folder)
+                break
+            except FileExistsError:  # several rollers started in the same second
+                suffix += 1
+                self.folder = os.path.join(root, f"{stamp}_{suffix}")
+        self.max_frames = max_frames
+        self.frames = {}
+        self.reads = open(os.path.join(self.folder, DATASET_READS_FILE), 'a')
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+    def record(self, roll_no, img, result, partial=False):
+        # partial: the read stopped after the passives, so its stats are not a label
+        raw_text, passives, stats, hits = result
+        key = frame_hash(img)
+        name = self.frames.get(key)
+        if name is None:
+            if len(self.frames) >= self.max_frames: return
+            name = f"{len(self.frames):06d}.png"
+            self.frames[key] = name
+            # cvtColor copies, so the capture ring buffer can be reused straight away
+            self.writer.submit(cv2.imwrite, os.path.join(self.folder, name), cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+        entry = {"roll": roll_no, "frame": name, "raw": raw_text, "passives": passives,
+                 "stats": stats, "hits": hits, "partial": partial}
+        self.writer.submit(self.write_line, json.dumps(entry))
+
+    def write_line(self, line):
+        self.reads.write(line + "\n")
+        self.reads.flush()
+
+    def close(self):
+        self.writer.shutdown(wait=True)
+        self.reads.close()
+
+def run_debug_test(log_main, log_raw, get_scan_rect, save_crops=False):
     log_main("--- TEST OCR STARTED ---", clear=True)
     rect = get_scan_rect()
     img = get_stats_image_dynamic(rect)
     if img is not None:
-        raw_text = ocr_process(img)
+        # F3 doubles as layout calibration. It goes through the OCR processes when
+        # they are running, so a roll in progress keeps its own engine.
+        pool = ocr_pool
+        if pool:
+            pool.invalidate_layout()
+        else:
+            with ocr_lock: layout_cache.invalidate()
+        if save_crops:
+            log_main(f"Saved crop: {save_crop(img)}")
+        raw_text, p, s = pool.read(img) if pool else read_frame(img)
         log_raw(f"--- RAW READ ---\n{raw_text}\n----------------", clear=True)
-        p, s = parse_stats(raw_text)
         if p: log_main(f"PASSIVES FOUND:\n> " + "\n> ".join(p))
         else: log_main("PASSIVES FOUND: [None]")
         if s:
@@ -176,103 +2075,865 @@ def run_debug_test(log_main, log_raw, get_scan_rect):
     else:
         log_main("Error capturing screen.")
 
-def run_macro(gui_data, log_main, log_raw):
-    global running
-    log_main("--- MACRO STARTED ---", clear=True)
-    
-    targets = gui_data['targets']
-    debug = gui_data['debug']
-    prob_one_in = gui_data['one_in_chance']
-    stats_callback = gui_data.get('stats_callback')
-    scan_rect = gui_data['scan_rect']
-    
-    coord_yes = gui_data['btn_yes']
-    coord_no = gui_data['btn_no']
+def rolls_to_hit(p, q):
+    # Rolls after which a hit has happened with probability q (geometric quantile)
+    if p >= 1: return 1
+    if p <= 0: return math.inf
+    return max(1, math.ceil(math.log1p(-q) / math.log1p(-p)))
 
-    delay_interact = gui_data.get('delay_interact', 0.6)
-    delay_refresh = gui_data.get('delay_refresh', 0.8)
+def slot_outcomes(names, bits, slots):
+    # Every equally likely way to fill `slots` distinct slots from `names`, as bitmasks
+    return np.array([sum(bits[n] for n in combo) for combo in itertools.combinations(names, slots)], dtype=np.int64)
 
-    any_double_passive = any(len(t['passives']) >= 2 for t in targets)
-    
-    if any_double_passive:
-        btn_gen_coords = coord_yes 
-        cost_per_roll = 500_000_000_000
-        log_main("Mode: Double Passive Gen (Yes/500B)")
-    else:
-        btn_gen_coords = coord_no 
-        cost_per_roll = 10_000_000_000
-        log_main("Mode: Single Passive Gen (No/10B)")
-
-    start_time = time.time()
-    rolls = 0
-    avg_roll_time = 0
-
-    while running:
-        if keyboard.is_pressed('f2'):
-            running = False
-            break
-        
-        pydirectinput.press('e')
-        time.sleep(delay_interact) 
+class OddsModel:
+    # Chance that one roll hits any of the targets. An amulet gets 1 passive (2 on a
+    # double roll) and STAT_SLOTS of the stats, all uniformly, and each stat's value
+    # independently. Values are uniform over the ones the stat can show (STAT_VALUES)
+    # until calibrate() has seen real rolls; after that each stat uses its observed values, shrunk towards
+    # uniform by ODDS_PRIOR_ROLLS.
+    # Overlapping targets are handled exactly: for every passive set and stat set the
+    # union of the targets that fit is summed over "which thresholds does each value
+    # clear" cells. When that is over ODDS_EXACT_BUDGET it falls back to Monte Carlo
+    # through TargetMatcher.
+    def __init__(self):
+        self.samples = {}
+        self.roll_seconds = None
+        self.cache = {}
 
-        wiggle_click(btn_gen_coords)
-        time.sleep(delay_refresh) 
-        
-        stats_img = get_stats_image_dynamic(scan_rect)
-        rolls += 1
-        
-        current_time = time.time()
-        elapsed = current_time - start_time
-        avg_roll_time = elapsed / rolls
-        est_time_remaining = (prob_one_in * avg_roll_time)
-        spent_total = rolls * cost_per_roll
+    def calibrate(self, history, limit=ODDS_CALIBRATION_ROLLS):
+        ts, values = history.recent_rolls(limit)
+        samples = {}
+        for j, stat in enumerate(STAT_KEYS):
+            lo, hi = STAT_RANGES[stat]
+            col = values[:, j]
+            col = col[(col >= lo) & (col <= hi)]  # drops NaN and misreads
+            if col.size: samples[stat] = np.sort(col)
+        gaps = np.diff(ts)
+        gaps = gaps[(gaps > 0) & (gaps < ODDS_MAX_ROLL_GAP)]
+        self.samples = samples
+        self.roll_seconds = float(np.median(gaps)) if gaps.size else None
+        self.cache.clear()
+        return len(ts)
 
-        if stats_callback:
-            stats_callback(rolls, avg_roll_time, est_time_remaining, spent_total)
+    def survival(self, stat, thresholds):
+        # P(value >= t) for each t
+        values = STAT_VALUES[stat]
+        t = np.asarray(thresholds, dtype=float)
+        prior = (len(values) - np.searchsorted(values, t - 1e-9, side="left")) / len(values)
+        seen = self.samples.get(stat)
+        if seen is None: return prior
+        k = len(seen)
+        observed = (k - np.searchsorted(seen, t, side="left")) / k
+        return (k * observed + ODDS_PRIOR_ROLLS * prior) / (k + ODDS_PRIOR_ROLLS)
 
-        raw_text = ocr_process(stats_img)
-        if debug:
-            log_raw(f"--- RAW ---\n{raw_text}", clear=True)
+    def sample_values(self, rng, n):
+        values = np.empty((n, len(STAT_KEYS)))
+        for j, stat in enumerate(STAT_KEYS):
+            shown = STAT_VALUES[stat]
+            values[:, j] = shown[rng.integers(len(shown), size=n)]
+            seen = self.samples.get(stat)
+            if seen is not None:
+                use_seen = rng.random(n) < len(seen) / (len(seen) + ODDS_PRIOR_ROLLS)
+                values[use_seen, j] = seen[rng.integers(len(seen), size=int(use_seen.sum()))]
+        return values
 
-        detected_passives, detected_stats = parse_stats(raw_text)
-        
-        log_msg = ""
-        if detected_passives: log_msg += f"Passive: {', '.join(detected_passives)}\n"
-        if detected_stats:
-            log_msg += "\n".join([f"{k.split('(')[0].strip()}: {v}" for k, v in detected_stats.items()])
-        
-        header_stats = f"Runs: {rolls} | Avg: {avg_roll_time:.1f}s"
-        log_main(f"--- {header_stats} ---\n{log_msg}", clear=True)
+    def reachable(self, targets, slots):
+        # Drops targets that can never hit and targets implied by another one; neither
+        # changes the union
+        matcher = TargetMatcher(targets)
+        pm, req, thr = matcher.passive_masks, matcher.required, matcher.thresholds
+        n_passives = np.array([bin(int(m)).count("1") for m in pm])
+        keep = matcher.possible & (n_passives <= slots) & (req.sum(axis=1) <= STAT_SLOTS)
+        # implies[a, b]: every roll that hits b also hits a
+        implies = (((pm[:, None] & pm[None, :]) == pm[:, None]) &
+                   np.all(~req[:, None, :] | req[None, :, :], axis=2) &
+                   np.all(thr[:, None, :] <= thr[None, :, :], axis=2))
+        implies &= keep[:, None] & keep[None, :]
+        np.fill_diagonal(implies, False)
+        # Of two identical targets only the first survives
+        same = implies & implies.T
+        redundant = np.any(implies & ~same, axis=0) | np.any(np.triu(same), axis=0)
+        return [t for t, ok in zip(targets, keep & ~redundant) if ok]
 
-        match_found = False
-        hit_target_index = -1
+    def value_union(self, thr):
+        # P(the values clear every threshold of at least one row of thr); -inf = no
+        # threshold. Each thresholded stat becomes a level, the number of distinct
+        # thresholds its value clears, and the level grid is summed exactly.
+        # -> (p, grid cells touched)
+        level_p, need = [], []
+        for j in np.flatnonzero(np.isfinite(thr).any(axis=0)):
+            cuts = np.unique(thr[np.isfinite(thr[:, j]), j])
+            surv = np.concatenate(([1.0], self.survival(STAT_KEYS[j], cuts), [0.0]))
+            level_p.append(surv[:-1] - surv[1:])
+            need.append(np.where(np.isfinite(thr[:, j]), np.searchsorted(cuts, thr[:, j]) + 1, 0))
+        if not level_p or np.any(np.all(np.isinf(thr), axis=1)): return 1.0, 1
+        cells = math.prod(len(p) for p in level_p)
+        if cells * len(thr) > ODDS_EXACT_BUDGET: return None, cells * len(thr)
+        levels = np.indices([len(p) for p in level_p]).reshape(len(level_p), -1).T
+        cell_p = np.prod([p[levels[:, k]] for k, p in enumerate(level_p)], axis=0)
+        clears = np.all(levels[:, None, :] >= np.array(need).T[None, :, :], axis=2).any(axis=1)
+        return float(cell_p @ clears), cells * len(thr)
 
-        for i, target in enumerate(targets):
-            wanted_passives = target['passives']
-            wanted_stats = target['stats']
+    def exact(self, matcher, slots):
+        pm, req, thr = matcher.passive_masks, matcher.required, matcher.thresholds
+        n = len(pm)
+        # Passive and stat-set outcomes; stat sets only matter on the stats some target wants
+        passive_sets = slot_outcomes(ALL_PASSIVES, PASSIVE_BITS, slots)
+        col_bits = 1 << np.arange(len(STAT_KEYS), dtype=np.int64)
+        used = int(col_bits[req.any(axis=0)].sum())
+        stat_sets, counts = np.unique(slot_outcomes(range(len(STAT_KEYS)), col_bits, STAT_SLOTS) & used, return_counts=True)
+        req_bits = req.astype(np.int64) @ col_bits
+        fits = (((passive_sets[None, :] & pm[:, None]) == pm[:, None])[:, :, None] &
+                ((stat_sets[None, :] & req_bits[:, None]) == req_bits[:, None])[:, None, :]).reshape(n, -1)
+        outcome_p = np.outer(np.full(len(passive_sets), 1 / len(passive_sets)), counts / counts.sum()).ravel()
 
-            match_count = sum(1 for p in wanted_passives if p in detected_passives)
-            if match_count < len(wanted_passives):
-                continue
+        # Outcomes that fit the same targets share one value union
+        groups, inverse = np.unique(fits.T, axis=0, return_inverse=True)
+        group_p = np.bincount(inverse.ravel(), weights=outcome_p, minlength=len(groups))
+        total, spent = 0.0, 0
+        for fit, weight in zip(groups, group_p):
+            if not fit.any() or weight == 0: continue
+            p, cost = self.value_union(thr[fit])
+            spent += cost
+            if p is None or spent > ODDS_EXACT_BUDGET: return None
+            total += weight * p
+        return float(total)
+
+    def monte_carlo(self, matcher, slots, samples=ODDS_MC_SAMPLES):
+        rng = np.random.default_rng(ODDS_MC_SEED)  # fixed so the display doesn't flicker
+        passive_sets = slot_outcomes(ALL_PASSIVES, PASSIVE_BITS, slots)
+        hits = 0
+        for start in range(0, samples, ODDS_MC_CHUNK):
+            n = min(ODDS_MC_CHUNK, samples - start)
+            masks = passive_sets[rng.integers(len(passive_sets), size=n)]
+            keys = rng.random((n, len(STAT_KEYS)))
+            values = self.sample_values(rng, n)
+            values[keys > np.partition(keys, STAT_SLOTS - 1, axis=1)[:, STAT_SLOTS - 1:STAT_SLOTS]] = np.nan
+            hits += int(matcher.match_batch(masks, values).any(axis=1).sum())
+        p = hits / samples
+        return p, math.sqrt(p * (1 - p) / samples)
+
+    def odds(self, targets, roll_seconds=None, double=None, samples=ODDS_MC_SAMPLES):
+        # -> dict: p (chance per roll), method, stderr, cost_per_roll, and P50/P90 of the
+        # rolls, honey and (with a roll time) seconds until the first hit. samples is
+        # the Monte Carlo budget when the exact sum is too big.
+        if double is None: double = any(len(t['passives']) >= 2 for t in targets)
+        key = (json.dumps(targets, sort_keys=True), double, samples)
+        result = self.cache.get(key)
+        if result is None:
+            slots = 2 if double else 1
+            kept = self.reachable(targets, slots) if targets else []
+            p, stderr, method = 0.0, 0.0, "exact"
+            if kept:
+                matcher = TargetMatcher(kept)
+                p = self.exact(matcher, slots)
+                if p is None:
+                    (p, stderr), method = self.monte_carlo(matcher, slots, samples), "monte_carlo"
+            if len(self.cache) >= ODDS_CACHE_SIZE: self.cache.clear()
+            result = self.cache[key] = {"p": p, "method": method, "stderr": stderr, "targets": len(kept),
+                                        "cost_per_roll": ROLL_COST_DOUBLE if double else ROLL_COST_SINGLE}
+        result = dict(result)
+        roll_seconds = roll_seconds or self.roll_seconds
+        for q in (50, 90):
+            rolls = rolls_to_hit(result["p"], q / 100)
+            result[f"rolls_p{q}"] = rolls
+            result[f"honey_p{q}"] = rolls * result["cost_per_roll"]
+            result[f"seconds_p{q}"] = rolls * roll_seconds if roll_seconds else None
+        return result
+
+odds_model = OddsModel()
+
+def calibrate_odds(path=HISTORY_FILE):
+    # Fits odds_model to the roll history if there is one; -> rolls used
+    if not os.path.exists(path): return 0
+    try: return odds_model.calibrate(RollHistory(path))
+    except sqlite3.Error:
+        logging.exception("Could not read roll history from %s", path)
+        return 0
+
+def target_odds(targets):
+    # -> (chance a roll hits any target, honey per roll), at the live sample budget
+    info = odds_model.odds(targets, samples=ODDS_LIVE_MC_SAMPLES)
+    return min(max(info["p"], 1e-9), 1.0), info["cost_per_roll"]
+
+class DirectInput:
+    # Game input through pydirectinput; holding F2 stops the roller
+    name = "directinput"
+
+    def __init__(self):
+        import_input()
+
+    def press(self, key):
+        pydirectinput.press(key)
+
+    def click(self, ratio_coords):
+        wiggle_click(ratio_coords)
+
+    def stop_requested(self):
+        try:
+            import_keyboard()
+            return keyboard.is_pressed('f2')
+        except Exception: return False  # no keyboard hook (e.g. Linux without root)
+
+class NullInput:
+    # Sends nothing, for replayed captures and dry runs
+    name = "null"
+
+    def press(self, key): pass
+
+    def click(self, ratio_coords): pass
+
+    def stop_requested(self): return False
+
+class SimInput:
+    # Game input for a GameSimulator
+    name = "sim"
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def press(self, key): self.simulator.press(key)
+
+    def click(self, ratio_coords): self.simulator.click(ratio_coords)
+
+    def stop_requested(self): return False
+
+class RollerEngine:
+    # The roll loop without Tk. config has the keys the GUI sends on F1 (targets,
+    # scan_rect, btn_yes, btn_no, delay_interact, delay_refresh, wait_for_change,
+    # overlap_ocr, adaptive_delays, record_dataset, roll_history, one_in_chance, max_rolls,
+    # watchdog, honey_budget).
+    # capture is a CaptureSession (None = the shared one), game_input has
+    # press/click/stop_requested, and reader(img, passive_gate) -> (raw_text, passives, stats).
+    # Events are dicts with a "type" of started, roll, read, hit, watchdog, log, error
+    # or stopped, passed to subscribers on the roller thread.
+    # frame_results is the read cache reader fills (its hit streak flags a stuck game).
+    # exclusive=False leaves the process-wide layout cache, timings and glyphs alone,
+    # for rollers sharing them under a SessionScheduler.
+    def __init__(self, config, capture=None, game_input=None, reader=read_frame, frame_results=None, exclusive=True):
+        self.config = config
+        self.capture = capture
+        self.input = game_input or DirectInput()
+        self.reader = reader
+        self.frame_results = frame_results or frame_cache
+        self.exclusive = exclusive
+        self.listeners = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.rolls = 0
+        self.hits = []
+        self.tuner = None
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def events(self):
+        # Every event from now on, as a queue for consumers on other threads
+        q = queue.Queue()
+        self.subscribe(q.put)
+        return q
+
+    def emit(self, kind, **data):
+        data["type"] = kind
+        for listener in list(self.listeners):
+            try: listener(data)
+            except Exception: logging.exception("Roller event listener failed")
+
+    def log(self, message):
+        self.emit("log", message=message)
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
 
-            stat_fail = False
-            for s, req_v in wanted_stats.items():
-                if s not in detected_stats:
-                    stat_fail = True
+    def join(self, timeout=None):
+        if self.thread: self.thread.join(timeout)
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def grab(self, scan_rect):
+        if self.capture is None: return get_stats_image_dynamic(scan_rect)
+        return self.capture.grab(scan_rect)
+
+    def recover(self, watchdog):
+        # Acts on a problem the watchdog flagged: pauses, or once its recoveries are
+        # used up returns the problem as the stop reason
+        flagged = watchdog.take_problem()
+        if flagged is None: return None
+        problem, message, tries = flagged
+        if tries > WATCHDOG_RECOVERIES:
+            self.emit("watchdog", action="stop", problem=problem, message=message)
+            self.log(f"Watchdog stopped the run: {message}")
+            return problem
+        self.emit("watchdog", action="pause", problem=problem, message=message)
+        self.log(f"Watchdog: {message}. Pausing {WATCHDOG_PAUSE:.0f}s, then retrying ({tries}/{WATCHDOG_RECOVERIES})")
+        self.stop_event.wait(WATCHDOG_PAUSE)
+        if self.exclusive: layout_cache.invalidate()
+        return None
+
+    def run(self):
+        reason = "stopped"
+        try:
+            reason = self.roll_loop()
+        except Exception as e:
+            reason = "error"
+            self.emit("error", message=str(e), exception=e)
+            logging.exception("Roller stopped on an error")
+        self.emit("stopped", reason=reason, rolls=self.rolls, hits=self.hits,
+                  delays=dict(self.tuner.delays) if self.tuner else None)
+        return reason
+
+    def roll_loop(self):
+        cfg = self.config
+        targets = cfg['targets']
+        prob_one_in = cfg.get('one_in_chance') or 1 / target_odds(targets)[0]
+        rolls_p50, rolls_p90 = rolls_to_hit(1 / prob_one_in, 0.5), rolls_to_hit(1 / prob_one_in, 0.9)
+        scan_rect = cfg['scan_rect']
+        delay_interact = cfg.get('delay_interact', DEFAULT_DELAY_INTERACT)
+        delay_refresh = cfg.get('delay_refresh', DEFAULT_DELAY_REFRESH)
+        wait_for_change = cfg.get('wait_for_change', DEFAULT_WAIT_FOR_CHANGE)
+        max_rolls = cfg.get('max_rolls', 0)
+        tuner = self.tuner = DelayTuner(delay_interact, delay_refresh) if cfg.get('adaptive_delays', DEFAULT_ADAPTIVE_DELAYS) else None
+        recorder = DatasetRecorder() if cfg.get('record_dataset', DEFAULT_RECORD_DATASET) else None
+        history = RollHistory(cfg.get('history_file', HISTORY_FILE)) if cfg.get('roll_history', DEFAULT_ROLL_HISTORY) else None
+
+        matcher = TargetMatcher(targets)
+        any_double_passive = any(len(t['passives']) >= 2 for t in targets)
+
+        if any_double_passive:
+            btn_gen_coords = cfg['btn_yes']
+            cost_per_roll = ROLL_COST_DOUBLE
+            self.log("Mode: Double Passive Gen (Yes/500B)")
+        else:
+            btn_gen_coords = cfg['btn_no']
+            cost_per_roll = ROLL_COST_SINGLE
+            self.log("Mode: Single Passive Gen (No/10B)")
+        watchdog = RollWatchdog(cfg.get('honey_budget', 0), cost_per_roll) if cfg.get('watchdog', DEFAULT_WATCHDOG) else None
+        if watchdog and watchdog.budget:
+            self.log(f"Honey budget: {format_large_number(watchdog.budget)} ({int(watchdog.budget // cost_per_roll):,} rolls)")
+
+        if self.exclusive:
+            layout_cache.invalidate()
+            stage_timer.reset()
+        self.frame_results.clear()
+        stage_timer.take_spans()
+        session = history.start_session(targets, any_double_passive) if history else None
+        start_time = last_roll_at = time.time()
+        rolls = 0
+        avg_roll_time = 0
+        self.emit("started", targets=len(targets), cost_per_roll=cost_per_roll, one_in_chance=prob_one_in)
+
+        # With overlap on, roll N is OCR'd on the worker while roll N+1 presses 'e' and
+        # waits delay_interact. The generate click is only sent once N's verdict is in.
+        ocr_worker = ThreadPoolExecutor(max_workers=1) if cfg.get('overlap_ocr', DEFAULT_OVERLAP_OCR) else None
+        pending = None
+
+        if recorder: self.log(f"Recording to {recorder.folder}")
+
+        gated_rolls = set()  # rolls whose staged read may have stopped after the passives
+
+        def evaluate(roll_no, stats_img, captured_at, spans):
+            result = evaluate_roll(stats_img, matcher, self.reader)
+            gated = staged_read and layout_cache_enabled and not matcher.passives_can_match(result[1])
+            if gated: gated_rolls.add(roll_no)
+            if history:
+                history.append(session, roll_no, captured_at, result[1], result[2], result[3],
+                               {**spans, **stage_timer.take_spans()})
+            if recorder:
+                recorder.record(roll_no, stats_img, result, gated)
+            frame_key = frame_hash(stats_img) if tuner or watchdog else None
+            if watchdog:
+                watchdog.observe_read(frame_key, result[1], result[2])
+            if tuner:
+                backed_off = tuner.observe(frame_key, result[1], result[2], gated)
+                if backed_off:
+                    self.emit("log", message=f"Bad read, {backed_off} delay -> {tuner.delays[backed_off]:.2f}s", debug=True)
+            return result
+
+        def report(roll_no, roll_avg, result):
+            raw_text, detected_passives, detected_stats, hits = result
+            gated = roll_no in gated_rolls
+            gated_rolls.discard(roll_no)
+            self.emit("read", roll=roll_no, avg_roll_time=roll_avg, raw_text=raw_text,
+                      passives=detected_passives, stats=detected_stats, hits=hits, gated=gated)
+            if not watchdog and self.frame_results.hit_streak >= FRAME_CACHE_STALL_STREAK:
+                self.log(f"Same amulet {self.frame_results.hit_streak + 1}x in a row, game may not be rolling")
+            if hits:
+                self.hits = hits
+                self.emit("hit", roll=roll_no, hits=hits, passives=detected_passives, stats=detected_stats)
+                return True
+            return False
+
+        reason = "stopped"
+        while not self.stop_event.is_set():
+            if self.input.stop_requested():
+                break
+            if max_rolls and rolls >= max_rolls:
+                reason = "max_rolls"
+                break
+            if watchdog and not watchdog.can_afford(rolls * cost_per_roll):
+                reason = "budget"
+                self.log(f"Stopping before the next roll would go past the honey budget "
+                         f"({format_large_number(rolls * cost_per_roll)} of {format_large_number(watchdog.budget)} spent)")
+                break
+
+            with stage_timer.span("press"):
+                self.input.press('e')
+            with stage_timer.span("interact_wait"):
+                time.sleep(tuner.interact if tuner else delay_interact)
+
+            if pending:
+                with stage_timer.span("ocr_wait"):
+                    verdict = pending[2].result()
+                hit = report(*pending[:2], verdict)
+                pending = None
+                if hit:
+                    reason = "hit"
                     break
-                if req_v > 0 and detected_stats[s] < req_v:
-                    stat_fail = True
+                stuck = self.recover(watchdog) if watchdog else None
+                if stuck:
+                    reason = stuck
                     break
-            
-            if not stat_fail:
-                match_found = True
-                hit_target_index = i
+
+            if wait_for_change:
+                with stage_timer.span("capture"):
+                    baseline_sig = frame_signature(self.grab(scan_rect))
+                with stage_timer.span("click"):
+                    self.input.click(btn_gen_coords)
+                with stage_timer.span("refresh_wait"):  # polls until the panel settles, captures included
+                    stats_img = wait_for_frame_settle(scan_rect, baseline_sig, tuner.refresh if tuner else delay_refresh, self.grab)
+            else:
+                with stage_timer.span("click"):
+                    self.input.click(btn_gen_coords)
+                with stage_timer.span("refresh_wait"):
+                    time.sleep(tuner.refresh if tuner else delay_refresh)
+                with stage_timer.span("capture"):
+                    stats_img = self.grab(scan_rect)
+            rolls += 1
+            self.rolls = rolls
+
+            current_time = time.time()
+            if watchdog: watchdog.observe_roll(current_time - last_roll_at)
+            last_roll_at = current_time
+            spans = stage_timer.take_spans()
+            elapsed = current_time - start_time
+            avg_roll_time = elapsed / rolls
+            # Rolls are independent, so the time left never depends on the rolls so far
+            self.emit("roll", roll=rolls, avg_roll_time=avg_roll_time, est_remaining=rolls_p50 * avg_roll_time,
+                      est_remaining_p90=rolls_p90 * avg_roll_time, spent=rolls * cost_per_roll)
+
+            if ocr_worker:
+                pending = (rolls, avg_roll_time, ocr_worker.submit(evaluate, rolls, stats_img, current_time, spans))
+                continue
+
+            if report(rolls, avg_roll_time, evaluate(rolls, stats_img, current_time, spans)):
+                reason = "hit"
                 break
+            stuck = self.recover(watchdog) if watchdog else None
+            if stuck:
+                reason = stuck
+                break
+
+        # Stopped with a roll still in flight: it may be the hit, so read it before leaving
+        if pending and report(*pending[:2], pending[2].result()):
+            reason = "hit"
+        if ocr_worker: ocr_worker.shutdown(wait=False)
+        if recorder: recorder.close()
+        if history: history.close()
+        if self.exclusive:
+            if glyph_classifier.dirty: glyph_classifier.save()
+            if rolls:
+                try: self.log(f"Timings saved to {stage_timer.dump()}")
+                except OSError: pass
+        return reason
+
+class SharedReader:
+    # One OCR engine serving several rollers. Reads are queued to a single worker
+    # thread, so the engine, layout caches and glyph classifier are only used from one
+    # thread, while the rollers' delays keep running. Each roller passes its own
+    # LayoutCache, as their windows' panels sit in different places. The worker takes everything
+    # waiting (up to OCR_BATCH_FRAMES) and reads it as one batch with read_frames.
+    # The time a read spends queued is recorded as the caller's ocr_queue stage.
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self.work, name="ocr")
+        self.worker.daemon = True
+        self.worker.start()
+
+    def read(self, img, passive_gate=None, cache=None, layout=None):
+        queued = time.perf_counter()
+        done = Future()
+        self.requests.put((img, passive_gate, cache, layout, done))
+        result, spans, started = done.result()
+        stage_timer.record("ocr_queue", started - queued)
+        stage_timer.add_spans(spans)
+        return result
+
+    def work(self):
+        while True:
+            batch = [self.requests.get()]
+            if batch[0] is None: return
+            while len(batch) < OCR_BATCH_FRAMES:
+                try: request = self.requests.get_nowait()
+                except queue.Empty: break
+                if request is None:
+                    self.requests.put(None)
+                    break
+                batch.append(request)
+            started = time.perf_counter()
+            stage_timer.take_spans()
+            try:
+                results = read_frames([request[:4] for request in batch])
+            except Exception as e:
+                for request in batch: request[4].set_exception(e)
+                continue
+            spans = stage_timer.take_spans()
+            for request, result in zip(batch, results): request[4].set_result((result, spans, started))
+
+    def close(self):
+        self.requests.put(None)
+        self.worker.join()
+
+def ocr_worker_main(worker_id, settings, requests, results):
+    # An OcrProcessPool worker: loads and warms its engine, then reads frames from the
+    # shared request queue until it gets None
+    try:
+        load_runtime(settings.get("ocr_engine", DEFAULT_ENGINE_PROFILE))
+        apply_ocr_settings(settings)
+        set_staged_read(settings.get("ocr_staged_read", DEFAULT_STAGED_READ))
+    except Exception as e:
+        results.put(("failed", worker_id, f"OCR process {worker_id + 1} failed to load ({e})"))
+        return
+    results.put(("ready", worker_id, None))
+    buffers = {}
+    layouts = {}  # a LayoutCache per session (layout key), layout_cache for None
+    layout_generation = 0
+    try:
+        while True:
+            request = requests.get()
+            if request is None: break
+            request_id, slot, name, shape, passive_gate, layout_key, generation = request
+            try:
+                if slot not in buffers or buffers[slot].name != name:
+                    if slot in buffers: buffers[slot].close()
+                    buffers[slot] = shared_memory.SharedMemory(name=name)
+                # Copied out so the layout cache and glyph samples never point into a slot
+                img = np.ndarray(shape, dtype=np.uint8, buffer=buffers[slot].buf).copy()
+                if generation != layout_generation:
+                    layout_cache.invalidate()
+                    layouts.clear()
+                    layout_generation = generation
+                layout = None if layout_key is None else layouts.setdefault(layout_key, LayoutCache())
+                stage_timer.take_spans()
+                result = read_image(img, passive_gate, layout)
+                results.put(("read", request_id, (result, stage_timer.take_spans())))
+            except Exception as e:
+                results.put(("error", request_id, f"{type(e).__name__}: {e}"))
+    finally:
+        for shm in buffers.values(): shm.close()
+        # Every worker learns glyphs; one of them keeps its templates
+        if worker_id == 0 and glyph_classifier.dirty: glyph_classifier.save()
+
+class OcrProcessPool:
+    # OCR in worker processes, so an inference never holds the GIL that the roll loop,
+    # the Tk loop and the hotkey hook need. Every worker loads and warms its own engine
+    # from settings (the OCR_SETTING_KEYS of ssa_settings.json) and keeps its own layout
+    # cache, glyph classifier and pipeline; this process only hashes frames for the
+    # read caches. Frames are copied into shared memory slots and only the slot name
+    # and shape are queued, so no pixels are pickled. There is one request queue and
+    # whichever worker is free takes the next frame.
+    # read() may be called from any thread and blocks until its frame is read; reads
+    # from different threads run in parallel up to the number of workers. passive_gate
+    # is pickled with the request, so it has to be a module function or a bound method
+    # (matcher.passives_can_match), not a lambda. If a worker dies, every read in flight
+    # and every later one raises, until ensure_ocr_pool replaces the pool.
+    def __init__(self, processes, settings):
+        ctx = multiprocessing.get_context("spawn")  # no forking a process with Tk and hooks in it
+        self.processes = processes
+        self.settings = settings
+        self.requests = ctx.Queue()
+        self.results = ctx.Queue()
+        self.buffers = [None] * (processes * OCR_PROCESS_SLOTS)
+        self.free_slots = queue.Queue()
+        for slot in range(len(self.buffers)): self.free_slots.put(slot)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.ids = itertools.count()
+        self.layout_generation = 0
+        self.error = None
+        self.closing = False
+        self.loading = processes
+        self.ready = Future()
+        self.workers = [ctx.Process(target=ocr_worker_main, args=(i, settings, self.requests, self.results),
+                                    name=f"ocr-{i + 1}", daemon=True) for i in range(processes)]
+        for worker in self.workers: worker.start()
+        self.dispatcher = threading.Thread(target=self.dispatch, name="ocr-results")
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    def invalidate_layout(self):
+        # Each worker drops its cached layout before its next read
+        self.layout_generation += 1
+
+    def read(self, img, passive_gate=None, cache=None, layout=None):
+        # read_frame in a worker; cache (a FrameResultCache) is checked and filled here.
+        # layout stands for a session's LayoutCache: each worker keeps its own per layout.
+        if cache is not None:
+            key = (frame_hash(img), passive_gate is not None)
+            cached = cache.get(key)
+            if cached: return cached
+        self.ready.result()
+        queued = time.perf_counter()
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        slot = self.free_slots.get()
+        try:
+            shm = self.buffers[slot]
+            if shm is None or shm.size < img.nbytes:
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+                shm = self.buffers[slot] = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+            np.ndarray(img.shape, dtype=np.uint8, buffer=shm.buf)[...] = img
+            done = Future()
+            with self.lock:
+                if self.error: raise RuntimeError(self.error)
+                request_id = next(self.ids)
+                self.pending[request_id] = done
+            layout_key = None if layout is None else id(layout)
+            self.requests.put((request_id, slot, shm.name, img.shape, passive_gate, layout_key, self.layout_generation))
+            result, spans = done.result()
+        finally:
+            self.free_slots.put(slot)
+        # Transfer and time waiting for a free worker count as ocr_queue
+        for stage, seconds in spans.items(): stage_timer.record(stage, seconds)
+        stage_timer.record("ocr_queue", max(0.0, time.perf_counter() - queued - sum(spans.values())))
+        if cache is not None: cache.put(key, result)
+        return result
+
+    def dispatch(self):
+        while True:
+            try:
+                kind, key, payload = self.results.get(timeout=OCR_PROCESS_POLL)
+            except queue.Empty:
+                dead = [w for w in self.workers if not w.is_alive()]
+                if dead and not self.closing:
+                    self.fail(f"OCR process {dead[0].name} exited (code {dead[0].exitcode})")
+                continue
+            if kind == "closed":
+                return
+            if kind == "ready":
+                self.loading -= 1
+                if not self.loading: self.ready.set_result(self)
+            elif kind == "failed":
+                self.fail(payload)
+            else:
+                with self.lock: done = self.pending.pop(key, None)
+                if done is None: continue
+                if kind == "read": done.set_result(payload)
+                else: done.set_exception(RuntimeError(payload))
+
+    def fail(self, message):
+        with self.lock:
+            if self.error is None: self.error = message
+            pending, self.pending = self.pending, {}
+        if not self.ready.done(): self.ready.set_exception(RuntimeError(message))
+        for done in pending.values(): done.set_exception(RuntimeError(message))
+
+    def close(self):
+        self.closing = True
+        for _ in self.workers: self.requests.put(None)
+        for worker in self.workers:
+            worker.join(OCR_PROCESS_STOP_TIMEOUT)
+            if worker.is_alive(): worker.terminate()
+        self.results.put(("closed", None, None))
+        self.dispatcher.join()
+        self.fail("OCR processes closed")
+        for shm in self.buffers:
+            if shm is None: continue
+            shm.close()
+            shm.unlink()
+        self.buffers = []
+
+def ocr_settings(settings):
+    # The part of ssa_settings.json OCR worker processes are built from
+    return {k: settings[k] for k in OCR_SETTING_KEYS if k in settings}
+
+ocr_pool = None
+ocr_pool_lock = threading.Lock()
+
+def ensure_ocr_pool(processes, settings=None):
+    # The running OcrProcessPool if it has these settings, else a new one once all its
+    # workers are warm; processes=0 closes it and reads go back to this process.
+    # Raises when a worker fails to load.
+    global ocr_pool
+    settings = settings or {}
+    with ocr_pool_lock:
+        if ocr_pool and (ocr_pool.processes != processes or ocr_pool.settings != settings or ocr_pool.error):
+            ocr_pool.close()
+            ocr_pool = None
+        if processes and not ocr_pool:
+            pool = OcrProcessPool(processes, settings)
+            try:
+                pool.ready.result()
+            except Exception:
+                pool.close()
+                raise
+            ocr_pool = pool
+        return ocr_pool
+
+class SharedInput:
+    # Serialises game input across rollers so one roller's key press never lands in
+    # the middle of another's click. With focus_point (screen ratios) the window is
+    # clicked first, which gives it keyboard focus when several game windows are open.
+    def __init__(self, inner, lock, focus_point=None):
+        self.inner = inner
+        self.lock = lock
+        self.focus_point = focus_point
+
+    def press(self, key):
+        with self.lock:
+            if self.focus_point: self.inner.click(self.focus_point)
+            self.inner.press(key)
 
-        if match_found:
-            log_main(f"!!! TARGET FOUND (Amulet {hit_target_index+1}) !!!")
-            running = False
-            break
+    def click(self, ratio_coords):
+        with self.lock: self.inner.click(ratio_coords)
+
+    def stop_requested(self):
+        return self.inner.stop_requested()
+
+class SessionScheduler:
+    # Runs one RollerEngine per game window in this process. Each session has its own
+    # config (scan rect, buttons, targets, delays), capture session, read cache and
+    # layout cache; they share one OCR engine through SharedReader (or the OcrProcessPool given as
+    # reader, which stays open after close) and the input devices through SharedInput.
+    # Rolling is sleep-bound, so while one session waits out its delays the others
+    # capture and read, and throughput grows with the number of windows until the OCR
+    # worker is busy full time.
+    # Events are the engines' events with a "session" index added. A hit stops only
+    # the session that found it.
+    def __init__(self, configs, captures, inputs, reader=None):
+        self.own_reader = reader is None
+        self.reader = reader or SharedReader()
+        self.input_lock = threading.Lock()
+        self.engines = []
+        self.layouts = []
+        for cfg, capture_session, game_input in zip(configs, captures, inputs):
+            results = FrameResultCache()
+            layout = LayoutCache()
+            self.layouts.append(layout)
+            self.engines.append(RollerEngine(
+                cfg, capture_session, SharedInput(game_input, self.input_lock, cfg.get('focus_point')),
+                lambda img, passive_gate=None, results=results, layout=layout:
+                    self.reader.read(img, passive_gate, results, layout),
+                results, exclusive=False))
+        self.started = None
+
+    def subscribe(self, callback):
+        for i, engine in enumerate(self.engines):
+            engine.subscribe(lambda event, i=i: callback({**event, "session": i}))
+        return callback
+
+    def start(self):
+        for layout in self.layouts:
+            with layout.lock: layout.invalidate()
+        if not self.own_reader: self.reader.invalidate_layout()
+        stage_timer.reset()
+        self.started = time.time()
+        for engine in self.engines: engine.start()
+        return self
+
+    def stop(self):
+        for engine in self.engines: engine.stop()
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        for engine in self.engines:
+            engine.join(None if deadline is None else max(0, deadline - time.time()))
+
+    def is_running(self):
+        return any(engine.is_running() for engine in self.engines)
+
+    def rolls_per_minute(self):
+        # -> (per session, total)
+        minutes = (time.time() - self.started) / 60 if self.started else 0
+        rates = [engine.rolls / minutes if minutes else 0.0 for engine in self.engines]
+        return rates, sum(rates)
+
+    def close(self):
+        # After the sessions have stopped
+        if self.own_reader: self.reader.close()
+        if glyph_classifier.dirty: glyph_classifier.save()
+        if any(engine.rolls for engine in self.engines):
+            try: stage_timer.dump()
+            except OSError: pass
+
+active_engine = None
+
+def run_macro(gui_data, log_main, log_raw):
+    # GUI side of RollerEngine: events go to the log panes and the Stats panel
+    global running, active_engine
+    log_main("--- MACRO STARTED ---", clear=True)
+
+    debug = gui_data['debug']
+    stats_callback = gui_data.get('stats_callback')
+    delays_callback = gui_data.get('delays_callback')
+    processes = gui_data.get('ocr_processes', DEFAULT_OCR_PROCESSES)
+    pool = None
+    try:
+        if processes and not (ocr_pool and ocr_pool.processes == processes):
+            log_main(f"Starting {processes} OCR processes...")
+        pool = ensure_ocr_pool(processes, gui_data.get('ocr_settings'))
+    except Exception as e:
+        log_main(f"{e}, reading in this process")
+    if pool:
+        pool.invalidate_layout()
+        engine = RollerEngine(gui_data, reader=lambda img, passive_gate=None: pool.read(img, passive_gate, frame_cache))
+    else:
+        engine = RollerEngine(gui_data)
+
+    def on_event(event):
+        kind = event["type"]
+        if kind == "log":
+            if debug or not event.get("debug"): log_main(event["message"])
+        elif kind == "roll":
+            if stats_callback:
+                stats_callback(event["roll"], event["avg_roll_time"], event["est_remaining"], event["spent"],
+                               event["est_remaining_p90"])
+        elif kind == "read":
+            if debug:
+                log_raw(f"--- RAW ---\n{event['raw_text']}", clear=True)
+            log_msg = ""
+            if event["passives"]: log_msg += f"Passive: {', '.join(event['passives'])}\n"
+            if event["stats"]:
+                log_msg += "\n".join([f"{k.split('(')[0].strip()}: {v}" for k, v in event["stats"].items()])
+
+            header_stats = f"Runs: {event['roll']} | Avg: {event['avg_roll_time']:.1f}s"
+            if engine.tuner:
+                header_stats += f" | Delays: {engine.tuner.interact:.2f}/{engine.tuner.refresh:.2f}s"
+            if debug:
+                header_stats += f" | Cache: {frame_cache.hits}/{frame_cache.hits + frame_cache.misses}"
+            log_main(f"--- {header_stats} ---\n{log_msg}", clear=True)
+        elif kind == "hit":
+            log_main(f"!!! TARGET FOUND (Amulet {', '.join(str(i + 1) for i in event['hits'])}) !!!")
+        elif kind == "error":
+            log_main(f"Stopped on an error: {event['message']}")
+        elif kind == "stopped":
+            if event["delays"] and delays_callback: delays_callback(event["delays"])
+
+    engine.subscribe(on_event)
+    active_engine = engine
+    if not running: engine.stop()  # F2 between F1 and here
+    engine.run()
+    running = False
+    active_engine = None
 
 class AmuletFrame(tk.Frame):
     def __init__(self, parent, index, remove_callback, calc_callback, master_app):
@@ -389,17 +3050,48 @@ class AmuletFrame(tk.Frame):
             if s in self.stat_entries:
                 self.stat_entries[s]['var'].set(val)
 
+class UiUpdateQueue:
+    # Worker threads post here instead of touching Tk, and the Tk loop drains it
+    # every UI_FRAME_MS. A keyed update replaces any pending one with the same key,
+    # and a text pane only keeps what was written since its last clear, so fast
+    # rolling renders just the latest state once per frame.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.updates = {}
+        self.panes = {}
+
+    def post(self, key, fn):
+        with self.lock:
+            self.updates.pop(key, None)
+            self.updates[key] = fn
+
+    def write(self, pane, message, clear=False):
+        with self.lock:
+            if clear or pane not in self.panes: self.panes[pane] = (clear, [])
+            lines = self.panes[pane][1]
+            lines.append(message)
+            if len(lines) > UI_MAX_PENDING_LINES: del lines[:-UI_MAX_PENDING_LINES]
+
+    def take(self):
+        with self.lock:
+            panes, updates = self.panes, self.updates
+            self.panes, self.updates = {}, {}
+        return panes, list(updates.values())
+
 class MacroGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("SSA Macro Multi-Target")
+        self.ui_queue = UiUpdateQueue()
+        self.odds_executor = ThreadPoolExecutor(max_workers=1)
+        self.odds_request = 0
         try:
             icon_path = resource_path("logo.ico")
             self.root.iconbitmap(icon_path) 
         except Exception: pass
 
         self.root.geometry("620x850")
-        self.config_file = "ssa_settings.json"
+        self.config_file = CONFIG_FILE
 
         self.overlay_window = None
         self.btn_overlays = {'yes': None, 'no': None}
@@ -419,6 +3111,23 @@ class MacroGUI:
         self.var_yes_y = tk.DoubleVar(value=DEFAULT_BTN_YES[1])
         self.var_delay_interact = tk.DoubleVar(value=DEFAULT_DELAY_INTERACT)
         self.var_delay_refresh = tk.DoubleVar(value=DEFAULT_DELAY_REFRESH)
+        self.var_wait_change = tk.BooleanVar(value=DEFAULT_WAIT_FOR_CHANGE)
+        self.var_overlap_ocr = tk.BooleanVar(value=DEFAULT_OVERLAP_OCR)
+        self.var_adaptive = tk.BooleanVar(value=DEFAULT_ADAPTIVE_DELAYS)
+        self.var_watchdog = tk.BooleanVar(value=DEFAULT_WATCHDOG)
+        self.tuned_delays = {}
+        self.var_capture = tk.StringVar(value=DEFAULT_CAPTURE_BACKEND)
+        self.var_pipeline = tk.StringVar(value=DEFAULT_PIPELINE)
+        self.var_layout_cache = tk.BooleanVar(value=DEFAULT_LAYOUT_CACHE)
+        self.var_glyph_fast = tk.BooleanVar(value=DEFAULT_GLYPH_FAST_PATH)
+        self.var_staged = tk.BooleanVar(value=DEFAULT_STAGED_READ)
+        self.var_record = tk.BooleanVar(value=DEFAULT_RECORD_DATASET)
+        self.var_history = tk.BooleanVar(value=DEFAULT_ROLL_HISTORY)
+        self.var_ocr_processes = tk.IntVar(value=DEFAULT_OCR_PROCESSES)
+        self.var_line_reread = tk.BooleanVar(value=DEFAULT_LINE_REREAD)
+        self.custom_pipeline = None
+        self.var_engine = tk.StringVar(value=DEFAULT_ENGINE_PROFILE)
+        self.custom_engine = None
 
         self.var_odds = tk.StringVar(value="--")
         self.var_cost = tk.StringVar(value="--")
@@ -427,6 +3136,8 @@ class MacroGUI:
         self.var_avg = tk.StringVar(value="--")
         self.var_est_time = tk.StringVar(value="--")
         self.var_spent = tk.StringVar(value="--")
+        self.var_time_q = tk.StringVar(value="--")
+        self.var_honey_q = tk.StringVar(value="--")
 
         self.header_label = tk.Label(root, text="SSA Auto Roller (Multi-Target)", font=("Segoe UI", 12, "bold"))
         self.header_label.pack(pady=2)
@@ -487,15 +3198,22 @@ class MacroGUI:
         self.log_raw_txt.pack(fill="both", expand=True)
         self.log_pane.add(self.raw_frame, width=220)
 
-        keyboard.add_hotkey('f1', self.validate_and_start)
+        # Hotkeys fire on the keyboard hook's thread, so F1 and F3 (which read the
+        # widgets) run from the Tk loop. F2 only flags the roller and logs through the queue.
+        import_keyboard()
+        keyboard.add_hotkey('f1', lambda: self.ui_queue.post("start", self.validate_and_start))
         keyboard.add_hotkey('f2', self.stop_thread)
-        keyboard.add_hotkey('f3', self.start_test_thread)
+        keyboard.add_hotkey('f3', lambda: self.ui_queue.post("test", self.start_test_thread))
 
         self.load_config()
+        # Heavy imports and the OCR engine load once the window is on screen
+        self.root.after(ENGINE_LOAD_DELAY_MS, self.reload_engine)
+        self.root.after(UI_FRAME_MS, self.drain_ui)
         if not self.amulets:
             self.add_amulet()
 
         self.calculate_odds()
+        threading.Thread(target=self.calibrate_odds, daemon=True).start()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def _on_mousewheel(self, event):
@@ -546,6 +3264,7 @@ class MacroGUI:
 
     def update_btn_overlay(self, *args):
         if not any(self.btn_overlays.values()): return
+        import_input()
         sw, sh = pyautogui.size()
         coords = self.get_btn_coords()
         for key in ['yes', 'no']:
@@ -597,6 +3316,11 @@ class MacroGUI:
         tk.Entry(content_frame, textvariable=self.honey_var, width=8).grid(row=0, column=1, sticky="w")
         self.honey_var.trace_add("write", lambda *args: self.calculate_odds())
 
+        tk.Label(content_frame, text="Covers Hit:", font=("Arial", 9)).grid(row=0, column=2, sticky="w", padx=15)
+        tk.Label(content_frame, textvariable=self.var_chance, font=("Segoe UI", 9, "bold")).grid(row=0, column=3, sticky="w")
+        # Stops at the honey above and when rolls stop going through
+        tk.Checkbutton(content_frame, text="Watchdog", variable=self.var_watchdog).grid(row=0, column=4, columnspan=2, sticky="w", padx=10)
+
         ttk.Separator(content_frame, orient='horizontal').grid(row=1, column=0, columnspan=6, sticky="ew", padx=2, pady=2)
 
         tk.Label(content_frame, text="Odds (Any):", font=("Arial", 9)).grid(row=2, column=0, sticky="w", padx=5)
@@ -616,6 +3340,44 @@ class MacroGUI:
 
         tk.Label(content_frame, text="Spent:", font=("Arial", 9)).grid(row=3, column=4, sticky="w", padx=15)
         tk.Label(content_frame, textvariable=self.var_spent, font=("Segoe UI", 9, "bold")).grid(row=3, column=5, sticky="w")
+
+        # Rolls to the first hit are geometric: half of runs hit by P50, nine in ten by P90
+        tk.Label(content_frame, text="P50/P90:", font=("Arial", 9)).grid(row=4, column=0, sticky="w", padx=5)
+        tk.Label(content_frame, textvariable=self.var_time_q, font=("Segoe UI", 9, "bold")).grid(row=4, column=1, columnspan=2, sticky="w")
+        tk.Label(content_frame, textvariable=self.var_honey_q, font=("Segoe UI", 9, "bold")).grid(row=4, column=3, columnspan=3, sticky="w")
+
+        ttk.Separator(content_frame, orient='horizontal').grid(row=5, column=0, columnspan=6, sticky="ew", padx=2, pady=2)
+
+        # Per-stage timing breakdown, collapsed by default
+        self.timing_frame = tk.Frame(content_frame)
+        self.timing_vars = {}
+
+        def toggle_timing():
+            if self.timing_frame.winfo_viewable():
+                self.timing_frame.grid_remove()
+                btn_timing.config(text="Timing [+]")
+            else:
+                self.timing_frame.grid(row=7, column=0, columnspan=6, sticky="w", padx=5)
+                btn_timing.config(text="Timing [-]")
+                self.refresh_timing()
+
+        btn_timing = tk.Button(content_frame, text="Timing [+]", font=("Consolas", 7), command=toggle_timing, borderwidth=1)
+        btn_timing.grid(row=6, column=0, sticky="w", padx=5)
+
+        for col, text in enumerate(["Stage", "p50 ms", "p90 ms", "p99 ms", "Count"]):
+            tk.Label(self.timing_frame, text=text, font=("Arial", 8, "bold")).grid(row=0, column=col, sticky="w", padx=4)
+        for row, stage in enumerate(TIMING_STAGES, start=1):
+            tk.Label(self.timing_frame, text=stage, font=("Arial", 8)).grid(row=row, column=0, sticky="w", padx=4)
+            self.timing_vars[stage] = [tk.StringVar(value="--") for _ in range(4)]
+            for col, var in enumerate(self.timing_vars[stage], start=1):
+                tk.Label(self.timing_frame, textvariable=var, font=("Consolas", 8)).grid(row=row, column=col, sticky="e", padx=4)
+
+    def refresh_timing(self):
+        summary = stage_timer.summary()
+        for stage, vars_ in self.timing_vars.items():
+            t = summary.get(stage)
+            values = [f"{t['p50_ms']:.1f}", f"{t['p90_ms']:.1f}", f"{t['p99_ms']:.1f}", str(t['count'])] if t else ["--"] * 4
+            for var, value in zip(vars_, values): var.set(value)
     
     def create_config_section(self, parent):
         container = tk.LabelFrame(parent, text="Macro Config", font=("Segoe UI", 9, "bold"), padx=2, pady=0)
@@ -639,10 +3401,54 @@ class MacroGUI:
 
         grp_delay = tk.LabelFrame(content_frame, text="Timing Delays (Seconds; Increase if Program Breaks", padx=2, pady=2)
         grp_delay.pack(fill="x", pady=2)
-        tk.Label(grp_delay, text="Click Delay (0.3-1.5):").pack(side="left", padx=5)
-        tk.Scale(grp_delay, variable=self.var_delay_interact, from_=0.3, to=1.5, resolution=0.1, orient="horizontal", showvalue=1, length=80).pack(side="left", padx=5)
-        tk.Label(grp_delay, text="Wait Stats (0.3-1.5):").pack(side="left", padx=5)
-        tk.Scale(grp_delay, variable=self.var_delay_refresh, from_=0.3, to=1.5, resolution=0.1, orient="horizontal", showvalue=1, length=80).pack(side="left", padx=5)
+        delay_row = tk.Frame(grp_delay)
+        delay_row.pack(fill="x")
+        tk.Label(delay_row, text="Click Delay (0.3-1.5):").pack(side="left", padx=5)
+        tk.Scale(delay_row, variable=self.var_delay_interact, from_=0.3, to=1.5, resolution=0.1, orient="horizontal", showvalue=1, length=80).pack(side="left", padx=5)
+        tk.Label(delay_row, text="Wait Stats (0.3-1.5):").pack(side="left", padx=5)
+        tk.Scale(delay_row, variable=self.var_delay_refresh, from_=0.3, to=1.5, resolution=0.1, orient="horizontal", showvalue=1, length=80).pack(side="left", padx=5)
+
+        mode_row = tk.Frame(grp_delay)
+        mode_row.pack(fill="x")
+        tk.Checkbutton(mode_row, text="Wait for Change (Wait Stats = timeout)", variable=self.var_wait_change).pack(side="left", padx=2)
+        tk.Checkbutton(mode_row, text="Overlap OCR", variable=self.var_overlap_ocr).pack(side="left", padx=2)
+        tk.Checkbutton(mode_row, text="Adaptive", variable=self.var_adaptive).pack(side="left", padx=2)
+
+        grp_ocr = tk.LabelFrame(content_frame, text="OCR (Benchmark pipelines with --bench-pipelines)", padx=2, pady=2)
+        grp_ocr.pack(fill="x", pady=2)
+        ocr_row = tk.Frame(grp_ocr)
+        ocr_row.pack(fill="x")
+        tk.Label(ocr_row, text="Capture:").pack(side="left", padx=5)
+        tk.OptionMenu(ocr_row, self.var_capture, *CAPTURE_BACKENDS).pack(side="left", padx=2)
+        tk.Label(ocr_row, text="Pipeline:").pack(side="left", padx=5)
+        tk.OptionMenu(ocr_row, self.var_pipeline, *PIPELINE_PRESETS, "custom",
+                      command=lambda v: set_ocr_pipeline(self.get_pipeline())).pack(side="left", padx=2)
+        tk.Label(ocr_row, text="Engine:").pack(side="left", padx=5)
+        tk.OptionMenu(ocr_row, self.var_engine, *ENGINE_PROFILES, "custom",
+                      command=lambda v: self.reload_engine()).pack(side="left", padx=2)
+
+        record_row = tk.Frame(grp_ocr)
+        record_row.pack(fill="x")
+        tk.Checkbutton(record_row, text="Record Dataset", variable=self.var_record).pack(side="left", padx=5)
+        tk.Checkbutton(record_row, text="Roll History", variable=self.var_history).pack(side="left", padx=2)
+        tk.Checkbutton(record_row, text="Re-read Unsure", variable=self.var_line_reread,
+                       command=lambda: set_line_reread(self.var_line_reread.get())).pack(side="left", padx=2)
+        # 0 reads in this process; more start worker processes on the next F1
+        tk.Label(record_row, text="OCR Processes:").pack(side="left", padx=5)
+        tk.OptionMenu(record_row, self.var_ocr_processes, *range(OCR_MAX_PROCESSES + 1)).pack(side="left", padx=2)
+
+        # Glyph fast path and staged reads both work on the cached line bands
+        cache_row = tk.Frame(grp_ocr)
+        cache_row.pack(fill="x")
+        tk.Checkbutton(cache_row, text="Cache Layout", variable=self.var_layout_cache,
+                       command=self.on_layout_cache_toggle).pack(side="left", padx=5)
+        self.chk_glyph_fast = tk.Checkbutton(cache_row, text="Glyph Fast Path", variable=self.var_glyph_fast,
+                                             command=lambda: set_glyph_fast_path(self.var_glyph_fast.get()))
+        self.chk_glyph_fast.pack(side="left", padx=2)
+        self.chk_staged = tk.Checkbutton(cache_row, text="Passives First", variable=self.var_staged,
+                                         command=lambda: set_staged_read(self.var_staged.get()))
+        self.chk_staged.pack(side="left", padx=2)
+        self.on_layout_cache_toggle()
 
         grp_scan = tk.LabelFrame(content_frame, text="OCR Scan Area, Modify till it covers the stats and passives text of NEW Amulet", padx=2, pady=2)
         grp_scan.pack(fill="x", pady=2)
@@ -689,6 +3495,57 @@ class MacroGUI:
         btn_pt = tk.Button(grp_btns, text="Show\nPoints", bg="#ccffcc", font=("Arial", 8), width=6, command=self.toggle_btn_overlay)
         btn_pt.grid(row=0, column=5, rowspan=2, padx=5, sticky="ns")
 
+    def on_layout_cache_toggle(self):
+        enabled = self.var_layout_cache.get()
+        set_layout_cache(enabled)
+        state = 'normal' if enabled else 'disabled'
+        self.chk_glyph_fast.config(state=state)
+        self.chk_staged.config(state=state)
+
+    def get_pipeline(self):
+        if self.var_pipeline.get() == "custom":
+            return self.custom_pipeline or DEFAULT_PIPELINE
+        return self.var_pipeline.get()
+
+    def get_engine(self):
+        if self.var_engine.get() == "custom":
+            return self.custom_engine or DEFAULT_ENGINE_PROFILE
+        return self.var_engine.get()
+
+    def get_ocr_settings(self):
+        return {
+            "ocr_pipeline": self.get_pipeline(),
+            "ocr_engine": self.get_engine(),
+            "ocr_layout_cache": self.var_layout_cache.get(),
+            "ocr_glyph_fast_path": self.var_glyph_fast.get(),
+            "ocr_staged_read": self.var_staged.get(),
+            "ocr_line_reread": self.var_line_reread.get()
+        }
+
+    def reload_engine(self):
+        # Off the UI thread. The first call also does the heavy imports; until it is
+        # done the title shows the loading state and F1/F3 wait on engine_ready
+        spec = self.get_engine()
+        name = spec if isinstance(spec, str) else "custom"
+        self.update_title()
+        def _load():
+            try:
+                self.log_main(f"Loading OCR engine '{name}'...")
+                load_runtime(spec)
+                if ocr_engine_spec != spec: set_ocr_engine(spec)
+                import_input()
+                self.log_main(f"OCR engine '{name}' ready")
+            except Exception as e:
+                self.log_main(f"OCR engine '{name}' failed to load ({e})")
+            self.ui_queue.post("title", self.update_title)
+        t = threading.Thread(target=_load)
+        t.daemon = True
+        t.start()
+
+    def update_title(self):
+        state = "" if engine_ready.done() else " (loading OCR engine...)"
+        self.root.title(f"SSA Macro Multi-Target{state}")
+
     def get_scan_rect(self):
         return (self.var_sx.get(), self.var_sy.get(), self.var_sw.get(), self.var_sh.get())
     
@@ -699,112 +3556,116 @@ class MacroGUI:
         }
 
     def calculate_odds(self):
-        total_p = 0.0
-        max_cost_mode = 10_000_000_000
-        
-        seen_configs = set()
-
-        for region in self.amulets:
-            data = region.get_config()
-            
-            if len(data['passives']) >= 2:
-                max_cost_mode = 500_000_000_000
+        # Reads the amulets here, computes on odds_executor (the Monte Carlo fallback for
+        # heavily overlapping targets takes a while) and shows the newest result
+        targets = [region.get_config() for region in self.amulets]
+        # Until the roll history has a measured roll time, the delays are the best guess
+        roll_seconds = odds_model.roll_seconds or self.var_delay_interact.get() + self.var_delay_refresh.get()
+        self.odds_request += 1
+        request = self.odds_request
 
-            passives_sig = tuple(sorted(data['passives']))
-            
-            stats_sig_list = []
-            for k, v in data['stats'].items():
-                stats_sig_list.append((k, v))
-            stats_sig = tuple(sorted(stats_sig_list))
-            
-            config_signature = (passives_sig, stats_sig)
-            
-            if config_signature in seen_configs:
-                continue 
-            
-            seen_configs.add(config_signature)
-
-            num_passives = len(data['passives'])
-            num_stats = len(data['stats'])
-            
-            p_passive = 1.0
-            
-            if num_passives == 1:
-                p_passive = 1/6
-            elif num_passives == 2:
-                p_passive = 1/15
-            
-            stat_numerator_map = {0: 126, 1: 70, 2: 35, 3: 15, 4: 5, 5: 1}
-            numerator = stat_numerator_map.get(num_stats, 0)
-            p_stat = numerator / 126.0
-            
-            p_region = p_passive * p_stat
-            total_p += p_region
+        def _compute():
+            if request != self.odds_request: return  # superseded by a later edit
+            info = odds_model.odds(targets, roll_seconds, samples=ODDS_LIVE_MC_SAMPLES)
+            if request == self.odds_request: self.ui_queue.post("odds", lambda: self.show_odds(info))
+        self.odds_executor.submit(_compute)
 
-        if total_p == 0: total_p = 1e-9
-        if total_p > 1.0: total_p = 1.0 
+    def show_odds(self, info):
+        total_p, max_cost_mode = min(max(info["p"], 1e-9), 1.0), info["cost_per_roll"]
 
         one_in_chance = 1 / total_p
         
         avg_cost_honey = one_in_chance * max_cost_mode
         avg_cost_trillion = avg_cost_honey / 1_000_000_000_000
 
-        try: current_honey_trill = float(self.honey_var.get())
-        except ValueError: current_honey_trill = 0.0
-        
-        current_honey_raw = current_honey_trill * 1_000_000_000_000
+        current_honey_raw = parse_honey(self.honey_var.get())
         possible_rolls = current_honey_raw // max_cost_mode
         
         if possible_rolls <= 0: success_chance = 0.0
         else: success_chance = 1 - math.pow((1 - total_p), possible_rolls)
         
-        self.var_odds.set(f"1 in {int(one_in_chance):,} (Comb)")
+        method = "Exact" if info["method"] == "exact" else "MC"
+        self.var_odds.set(f"1 in {int(one_in_chance):,} ({method})")
         self.var_cost.set(f"{avg_cost_trillion:.2f} T")
         self.var_chance.set(f"{success_chance*100:.2f}%")
-        
-        return one_in_chance
+        if info["p"] > 0:
+            self.var_time_q.set(f"{format_time(info['seconds_p50'])} / {format_time(info['seconds_p90'])}")
+            self.var_honey_q.set(f"{format_large_number(info['honey_p50'])} / {format_large_number(info['honey_p90'])}")
+        else:
+            self.var_time_q.set("--")
+            self.var_honey_q.set("--")
 
-    def update_live_stats(self, runs, avg_time, est_remain, spent_total):
+    def calibrate_odds(self):
+        # Background thread: fit stat values and roll time to the history, then redraw
+        if calibrate_odds(HISTORY_FILE): self.ui_queue.post("odds_calibrated", self.calculate_odds)
+
+    def update_live_stats(self, runs, avg_time, est_remain, spent_total, est_remain_p90=None):
         def _update():
             self.var_runs.set(str(runs))
             self.var_avg.set(f"{avg_time:.1f}s")
-            self.var_est_time.set(format_time(est_remain))
+            est = format_time(est_remain)
+            if est_remain_p90: est += f" / {format_time(est_remain_p90)}"
+            self.var_est_time.set(est)
             self.var_spent.set(format_large_number(spent_total))
-        self.root.after(0, _update)
+            if self.timing_frame.winfo_viewable(): self.refresh_timing()
+        self.ui_queue.post("live_stats", _update)
 
     def toggle_top(self):
         self.root.attributes('-topmost', self.always_on_top.get())
 
     def log_main(self, message, clear=False):
-        self.log_main_txt.config(state='normal')
-        if clear: self.log_main_txt.delete('1.0', tk.END)
-        self.log_main_txt.insert(tk.END, message + "\n")
-        self.log_main_txt.see(tk.END)
-        self.log_main_txt.config(state='disabled')
+        self.ui_queue.write(self.log_main_txt, message, clear)
 
     def log_raw(self, message, clear=False):
-        self.log_raw_txt.config(state='normal')
-        if clear: self.log_raw_txt.delete('1.0', tk.END)
-        self.log_raw_txt.insert(tk.END, message + "\n")
-        self.log_raw_txt.see(tk.END)
-        self.log_raw_txt.config(state='disabled')
+        self.ui_queue.write(self.log_raw_txt, message, clear)
+
+    def drain_ui(self):
+        try:
+            panes, updates = self.ui_queue.take()
+            for txt, (clear, lines) in panes.items():
+                txt.config(state='normal')
+                if clear: txt.delete('1.0', tk.END)
+                txt.insert(tk.END, "".join(line + "\n" for line in lines))
+                txt.see(tk.END)
+                txt.config(state='disabled')
+            for fn in updates: fn()
+        finally:
+            self.root.after(UI_FRAME_MS, self.drain_ui)
 
     def start_test_thread(self):
-        t = threading.Thread(target=run_debug_test, args=(self.log_main, self.log_raw, self.get_scan_rect))
+        def _test():
+            if not engine_ready.done(): self.log_main("Waiting for the OCR engine to load...")
+            try: engine_ready.result()
+            except Exception as e:
+                self.log_main(f"OCR engine failed to load ({e})")
+                return
+            if not running:
+                try: ensure_capture(self.var_capture.get())
+                except Exception: ensure_capture("pyautogui")
+            run_debug_test(self.log_main, self.log_raw, self.get_scan_rect, self.debug_mode.get())
+        t = threading.Thread(target=_test)
         t.daemon = True
         t.start()
 
     def validate_and_start(self):
+        if not engine_ready.done():
+            # Queue the start instead of making the user press F1 again
+            self.log_main("Starting once the OCR engine has loaded...")
+            engine_ready.add_done_callback(lambda f: self.ui_queue.post("start", self.validate_and_start))
+            return
+        if engine_ready.exception():
+            self.log_main(f"OCR engine failed to load ({engine_ready.exception()})")
+            return
         self.save_config()
         
         all_targets = []
         for r in self.amulets:
             all_targets.append(r.get_config())
             
-        one_in_chance = self.calculate_odds()
-        self.start_thread(all_targets, one_in_chance)
+        self.calculate_odds()
+        self.start_thread(all_targets)
 
-    def start_thread(self, targets, one_in_chance):
+    def start_thread(self, targets):
         global running
         if not running:
             running = True
@@ -813,26 +3674,56 @@ class MacroGUI:
             self.var_est_time.set("Calc...")
             self.var_spent.set("0")
             self.log_main(f"Starting... {len(targets)} Target Amulets", clear=True)
+            try:
+                set_capture_backend(self.var_capture.get())
+            except Exception as e:
+                self.log_main(f"Capture backend failed ({e}), using pyautogui")
+                set_capture_backend("pyautogui")
             
             btn_coords = self.get_btn_coords()
+            delay_interact = self.var_delay_interact.get()
+            delay_refresh = self.var_delay_refresh.get()
+            # Adaptive mode picks up where it left off on this resolution, sliders otherwise
+            if self.var_adaptive.get():
+                tuned = self.tuned_delays.get(screen_key(), {})
+                delay_interact = tuned.get("interact", delay_interact)
+                delay_refresh = tuned.get("refresh", delay_refresh)
+                self.log_main(f"Adaptive delays from {delay_interact:.2f}s / {delay_refresh:.2f}s")
             data = {
                 'targets': targets, 
                 'debug': self.debug_mode.get(),
-                'one_in_chance': one_in_chance,
+                'one_in_chance': None,  # the roller works it out off the Tk thread
                 'stats_callback': self.update_live_stats,
                 'scan_rect': self.get_scan_rect(),
                 'btn_yes': btn_coords['yes'],
                 'btn_no': btn_coords['no'],
-                'delay_interact': self.var_delay_interact.get(),
-                'delay_refresh': self.var_delay_refresh.get()
+                'delay_interact': delay_interact,
+                'delay_refresh': delay_refresh,
+                'adaptive_delays': self.var_adaptive.get(),
+                'delays_callback': self.store_tuned_delays,
+                'wait_for_change': self.var_wait_change.get(),
+                'overlap_ocr': self.var_overlap_ocr.get(),
+                'record_dataset': self.var_record.get(),
+                'roll_history': self.var_history.get(),
+                'ocr_processes': self.var_ocr_processes.get(),
+                'ocr_settings': self.get_ocr_settings(),
+                'watchdog': self.var_watchdog.get(),
+                'honey_budget': parse_honey(self.honey_var.get())
             }
             t = threading.Thread(target=run_macro, args=(data, self.log_main, self.log_raw))
             t.daemon = True
             t.start()
 
+    def store_tuned_delays(self, delays):
+        def _store():
+            self.tuned_delays[screen_key()] = {k: round(v, 3) for k, v in delays.items()}
+            self.save_config()
+        self.ui_queue.post("tuned_delays", _store)
+
     def stop_thread(self):
         global running
         running = False
+        if active_engine: active_engine.stop()
         self.log_main("Stopping...")
     
     def save_config(self):
@@ -847,12 +3738,22 @@ class MacroGUI:
             "always_on_top": self.always_on_top.get(),
             "debug_mode": self.debug_mode.get(),
             "honey_amount": self.honey_var.get(),
+            "watchdog": self.var_watchdog.get(),
             "scan_rect": self.get_scan_rect(),
             "btn_coords": self.get_btn_coords(),
             "delays": {
                 "interact": self.var_delay_interact.get(),
-                "refresh": self.var_delay_refresh.get()
+                "refresh": self.var_delay_refresh.get(),
+                "wait_for_change": self.var_wait_change.get(),
+                "overlap_ocr": self.var_overlap_ocr.get(),
+                "adaptive": self.var_adaptive.get(),
+                "tuned": self.tuned_delays
             },
+            "capture_backend": self.var_capture.get(),
+            **self.get_ocr_settings(),
+            "ocr_processes": self.var_ocr_processes.get(),
+            "record_dataset": self.var_record.get(),
+            "roll_history": self.var_history.get(),
             "amulets": amulets_data 
         }
         try:
@@ -867,6 +3768,7 @@ class MacroGUI:
             self.toggle_top()
             self.debug_mode.set(data.get("debug_mode", False))
             self.honey_var.set(data.get("honey_amount", "0"))
+            self.var_watchdog.set(data.get("watchdog", DEFAULT_WATCHDOG))
             
             scan = data.get("scan_rect", DEFAULT_SCAN)
             if len(scan) == 4:
@@ -882,6 +3784,40 @@ class MacroGUI:
             delays = data.get("delays", {})
             self.var_delay_interact.set(delays.get("interact", DEFAULT_DELAY_INTERACT))
             self.var_delay_refresh.set(delays.get("refresh", DEFAULT_DELAY_REFRESH))
+            self.var_wait_change.set(delays.get("wait_for_change", DEFAULT_WAIT_FOR_CHANGE))
+            self.var_overlap_ocr.set(delays.get("overlap_ocr", DEFAULT_OVERLAP_OCR))
+            self.var_adaptive.set(delays.get("adaptive", DEFAULT_ADAPTIVE_DELAYS))
+            self.tuned_delays = delays.get("tuned", {})
+
+            backend = data.get("capture_backend", DEFAULT_CAPTURE_BACKEND)
+            if backend in CAPTURE_BACKENDS: self.var_capture.set(backend)
+
+            pipeline = data.get("ocr_pipeline", DEFAULT_PIPELINE)
+            if isinstance(pipeline, list):
+                self.custom_pipeline = pipeline
+                self.var_pipeline.set("custom")
+            elif pipeline in PIPELINE_PRESETS:
+                self.var_pipeline.set(pipeline)
+            set_ocr_pipeline(self.get_pipeline())
+            # The engine itself is built from these settings at import
+            engine = data.get("ocr_engine", DEFAULT_ENGINE_PROFILE)
+            if isinstance(engine, dict):
+                self.custom_engine = engine
+                self.var_engine.set("custom")
+            elif engine in ENGINE_PROFILES:
+                self.var_engine.set(engine)
+            self.var_layout_cache.set(data.get("ocr_layout_cache", DEFAULT_LAYOUT_CACHE))
+            self.on_layout_cache_toggle()
+            self.var_glyph_fast.set(data.get("ocr_glyph_fast_path", DEFAULT_GLYPH_FAST_PATH))
+            set_glyph_fast_path(self.var_glyph_fast.get())
+            self.var_staged.set(data.get("ocr_staged_read", DEFAULT_STAGED_READ))
+            set_staged_read(self.var_staged.get())
+            self.var_line_reread.set(data.get("ocr_line_reread", DEFAULT_LINE_REREAD))
+            set_line_reread(self.var_line_reread.get())
+            processes = data.get("ocr_processes", DEFAULT_OCR_PROCESSES)
+            if isinstance(processes, int): self.var_ocr_processes.set(min(max(processes, 0), OCR_MAX_PROCESSES))
+            self.var_record.set(data.get("record_dataset", DEFAULT_RECORD_DATASET))
+            self.var_history.set(data.get("roll_history", DEFAULT_ROLL_HISTORY))
 
             saved_amulets = data.get("amulets", data.get("regions", []))
             
@@ -896,9 +3832,501 @@ class MacroGUI:
 
     def on_close(self):
         self.save_config()
+        if glyph_classifier.dirty: glyph_classifier.save()
+        if ocr_pool: ocr_pool.close()
         self.root.destroy()
 
-if __name__ == "__main__":
+def same_read(a, b):
+    passives_a, stats_a = a
+    passives_b, stats_b = b
+    if set(passives_a) != set(passives_b) or set(stats_a) != set(stats_b): return False
+    return all(abs(stats_a[k] - stats_b[k]) < 1e-6 for k in stats_a)
+
+def load_crop_labels(folder):
+    # labels.json: {"<file>": {"passives": [...], "stats": {"<stat key>": value}}}
+    # Recorded datasets without one are labelled by the reads saved while rolling
+    path = os.path.join(folder, "labels.json")
+    if os.path.exists(path):
+        with open(path, 'r') as f: data = json.load(f)
+        return {name: (label.get("passives", []), label.get("stats", {})) for name, label in data.items()}
+    labels = {}
+    for entry in load_dataset_reads(folder):
+        labels.setdefault(entry["frame"], (entry.get("passives", []), entry.get("stats", {})))
+    return labels or None
+
+def load_dataset_reads(folder):
+    path = os.path.join(folder, DATASET_READS_FILE)
+    if not os.path.exists(path): return []
+    entries = []
+    with open(path, 'r') as f:
+        for line in f:
+            try: entries.append(json.loads(line))
+            except ValueError: continue  # torn last line from a crash
+    return entries
+
+def load_partial_frames(folder):
+    if os.path.exists(os.path.join(folder, "labels.json")): return set()
+    first = {}
+    for entry in load_dataset_reads(folder):
+        first.setdefault(entry["frame"], entry.get("partial", False))
+    return {name for name, partial in first.items() if partial}
+
+def bench_pipelines(folder, repeat=1, settings_pipeline=None):
+    frames = [(os.path.basename(p), load_rgb_image(p)) for p in list_image_files(folder)]
+    frames = [(name, img) for name, img in frames if img is not None]
+    if not frames:
+        print(f"No crops found in {folder}")
+        return
+
+    variants = dict(PIPELINE_PRESETS)
+    if isinstance(settings_pipeline, list): variants["custom"] = settings_pipeline
+
+    labels = load_crop_labels(folder)
+    ocr_process(frames[0][1])  # warm up the ONNX sessions so the first variant isn't penalised
+
+    rows = []
+    reads = {}
+    for name, pipeline in variants.items():
+        prep_time = ocr_time = 0.0
+        reads[name] = {}
+        for _ in range(repeat):
+            for fname, frame in frames:
+                t0 = time.perf_counter()
+                img, _ = preprocess_frame(frame, pipeline)
+                t1 = time.perf_counter()
+                reads[name][fname] = parse_stats(run_ocr(img))
+                t2 = time.perf_counter()
+                prep_time += t1 - t0
+                ocr_time += t2 - t1
+        n = len(frames) * repeat
+        rows.append((name, prep_time * 1000 / n, ocr_time * 1000 / n))
+
+    # Without labels every variant is scored against what the default pipeline reads
+    reference = labels if labels is not None else reads[DEFAULT_PIPELINE]
+    ref_name = "labels" if labels is not None else f"'{DEFAULT_PIPELINE}'"
+    print(f"{len(frames)} crops x {repeat}, accuracy vs {ref_name}")
+    print(f"{'pipeline':<20}{'prep ms':>10}{'ocr ms':>10}{'total ms':>10}{'accuracy':>10}")
+    best = None
+    for name, prep_ms, ocr_ms in sorted(rows, key=lambda r: r[1] + r[2]):
+        scored = [f for f in reference if f in reads[name]]
+        correct = sum(1 for f in scored if same_read(reads[name][f], reference[f]))
+        acc = correct / len(scored) if scored else 0.0
+        if best is None and scored and correct == len(scored): best = name
+        print(f"{name:<20}{prep_ms:>10.2f}{ocr_ms:>10.2f}{prep_ms + ocr_ms:>10.2f}{acc * 100:>9.1f}%")
+    if best: print(f"Cheapest pipeline with full accuracy: {best}")
+
+def apply_ocr_settings(settings):
+    set_ocr_pipeline(settings.get("ocr_pipeline", DEFAULT_PIPELINE))
+    set_layout_cache(settings.get("ocr_layout_cache", DEFAULT_LAYOUT_CACHE))
+    set_glyph_fast_path(settings.get("ocr_glyph_fast_path", DEFAULT_GLYPH_FAST_PATH))
+    set_line_reread(settings.get("ocr_line_reread", DEFAULT_LINE_REREAD))
+
+def settings_targets(settings):
+    return [{'passives': a.get('passives', []), 'stats': a.get('stats', {})}
+            for a in settings.get("amulets", []) if isinstance(a, dict)]
+
+def bench_dataset(folder, repeat=1, settings=None, batch=1):
+    # Replays saved frames through every roll stage with the saved OCR settings.
+    # Reads are never gated, so staged reads are not part of the timings. With
+    # batch > 1, frames go through OCR that many at a time (ocr_lines_batch) and each
+    # is timed as an equal share of its batch. reread is the second look at unsure
+    # lines (ocr_line_reread); most frames don't need one.
+    settings = settings or {}
+    paths = list_image_files(folder)
+    if not paths:
+        print(f"No frames found in {folder}")
+        return
+    apply_ocr_settings(settings)
+    matcher = TargetMatcher(settings_targets(settings))
+    labels = load_crop_labels(folder) or {}
+    partial = load_partial_frames(folder)
+    ocr_process(load_rgb_image(paths[0]))  # warm up the ONNX sessions
+
+    stages = ("decode", "preprocess", "ocr", "parse", "reread", "match")
+    times = {s: [] for s in stages}
+    reads = {}
+    rereads = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for chunk_start in range(0, len(paths), batch):
+            t0 = time.perf_counter()
+            chunk = [(path, load_rgb_image(path)) for path in paths[chunk_start:chunk_start + batch]]
+            chunk = [(path, frame) for path, frame in chunk if frame is not None]
+            if not chunk: continue
+            t1 = time.perf_counter()
+            prepared = [preprocess_frame(frame) for _, frame in chunk]
+            t2 = time.perf_counter()
+            if batch > 1: batch_lines = ocr_lines_batch([img for img, _ in prepared])
+            else: batch_lines = [ocr_lines(prepared[0][0])]
+            t3 = time.perf_counter()
+            parsed = [stat_parser.parse_lines(lines) for lines in batch_lines]
+            t4 = time.perf_counter()
+            for j, ((_, frame), (_, transform), lines) in enumerate(zip(chunk, prepared, batch_lines)):
+                if not (parsed[j][2] and line_reread): continue
+                lines = reread_lines(frame, lines, parsed[j][2], transform)
+                parsed[j] = stat_parser.parse_lines(lines)
+                rereads += 1
+            t5 = time.perf_counter()
+            parsed = [(passives, stats) for passives, stats, _ in parsed]
+            for passives, stats in parsed: matcher.match_all(passives, stats)
+            t6 = time.perf_counter()
+            for stage, a, b in zip(stages, (t0, t1, t2, t3, t4, t5), (t1, t2, t3, t4, t5, t6)):
+                times[stage] += [(b - a) * 1000 / len(chunk)] * len(chunk)
+            for (path, _), read in zip(chunk, parsed): reads[os.path.basename(path)] = read
+    wall = time.perf_counter() - start
+
+    n = len(times["ocr"])
+    batching = f", batches of {batch}" if batch > 1 else ""
+    print(f"{len(paths)} frames x {repeat}: {n / wall:.2f} frames/sec, {len(matcher.targets)} targets{batching}, "
+          f"{rereads} with unsure lines re-read")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage in stages:
+        p50, p90, p99 = np.percentile(times[stage], [50, 90, 99])
+        print(f"{stage:<12}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{max(times[stage]):>10.2f}")
+
+    scored = [f for f in labels if f in reads]
+    if not scored:
+        print("No labels, accuracy not scored")
+        return
+    wrong = []
+    for f in scored:
+        if f in partial: ok = set(reads[f][0]) == set(labels[f][0])
+        else: ok = same_read(reads[f], labels[f])
+        if not ok: wrong.append(f)
+    print(f"Accuracy: {len(scored) - len(wrong)}/{len(scored)} ({(len(scored) - len(wrong)) * 100 / len(scored):.1f}%)")
+    for f in wrong[:10]:
+        print(f"  {f}: read {reads[f]}, expected {labels[f]}")
+
+def bench_engines(folder, repeat=1, settings=None):
+    # Same frames through every engine profile; layout cache and glyph fast path are
+    # off so the timings are the engine's own
+    global ocr_model
+    settings = settings or {}
+    frames = [(os.path.basename(p), load_rgb_image(p)) for p in list_image_files(folder)]
+    frames = [(name, img) for name, img in frames if img is not None]
+    if not frames:
+        print(f"No crops found in {folder}")
+        return
+    set_ocr_pipeline(settings.get("ocr_pipeline", DEFAULT_PIPELINE))
+    set_layout_cache(False)
+    set_glyph_fast_path(False)
+    prepared = [(name, preprocess_frame(img)[0]) for name, img in frames]
+
+    import onnxruntime as ort
+    available = ort.get_available_providers()
+    variants = dict(ENGINE_PROFILES)
+    if isinstance(settings.get("ocr_engine"), dict): variants["custom"] = settings["ocr_engine"]
+
+    labels = load_crop_labels(folder)
+    rows = []
+    reads = {}
+    saved_model = ocr_model
+    for name, spec in variants.items():
+        provider = PROVIDER_NAMES.get(resolve_engine_profile(spec)["provider"])
+        if provider and provider not in available:
+            print(f"{name}: {provider} not available, skipped")
+            continue
+        t0 = time.perf_counter()
+        ocr_model = create_ocr_engine(spec)
+        t1 = time.perf_counter()
+        run_ocr(prepared[0][1])
+        t2 = time.perf_counter()
+        times = []
+        reads[name] = {}
+        for _ in range(repeat):
+            for fname, img in prepared:
+                t = time.perf_counter()
+                reads[name][fname] = parse_stats(run_ocr(img))
+                times.append((time.perf_counter() - t) * 1000)
+        rows.append((name, t1 - t0, (t2 - t1) * 1000, *np.percentile(times, [50, 90])))
+    ocr_model = saved_model
+
+    reference = labels if labels is not None else reads.get(DEFAULT_ENGINE_PROFILE, {})
+    ref_name = "labels" if labels is not None else f"'{DEFAULT_ENGINE_PROFILE}'"
+    print(f"{len(frames)} crops x {repeat}, accuracy vs {ref_name}")
+    print(f"{'engine':<16}{'load s':>8}{'first ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'accuracy':>10}")
+    for name, load_s, first_ms, p50, p90 in sorted(rows, key=lambda r: r[3]):
+        scored = [f for f in reference if f in reads[name]]
+        correct = sum(1 for f in scored if same_read(reads[name][f], reference[f]))
+        acc = correct / len(scored) if scored else 0.0
+        print(f"{name:<16}{load_s:>8.2f}{first_ms:>10.1f}{p50:>10.1f}{p90:>10.1f}{acc * 100:>9.1f}%")
+
+def quantize_models(folder=QUANT_MODELS_DIR):
+    # Dynamic int8 copies of the stock det/rec models for the int8 engine option.
+    # onnxruntime's quantizer needs the onnx package (pip install onnx).
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+    except ImportError as e:
+        print(f"Quantizing needs the onnx package: {e}")
+        return
+    stock = create_ocr_engine(DEFAULT_ENGINE_PROFILE)
+    sources = {"det": stock.text_det.infer.session._model_path,
+               "rec": stock.text_rec.session.session._model_path}
+    os.makedirs(folder, exist_ok=True)
+    for part, target in quantized_model_paths(folder).items():
+        quantize_dynamic(sources[part], target, weight_type=QuantType.QUInt8)
+        print(f"{part}: {os.path.getsize(sources[part]) // 1024} KB -> {os.path.getsize(target) // 1024} KB ({target})")
+
+def roller_config(settings, screen_size=None):
+    # ssa_settings.json -> RollerEngine config, the same data the GUI sends on F1.
+    # screen_size picks the tuned delays; it defaults to the real screen's.
+    delays = settings.get("delays", {})
+    btns = settings.get("btn_coords", {})
+    targets = settings_targets(settings)
+    delay_interact = delays.get("interact", DEFAULT_DELAY_INTERACT)
+    delay_refresh = delays.get("refresh", DEFAULT_DELAY_REFRESH)
+    adaptive = delays.get("adaptive", DEFAULT_ADAPTIVE_DELAYS)
+    if adaptive:
+        tuned = delays.get("tuned", {}).get(screen_key(screen_size), {})
+        delay_interact = tuned.get("interact", delay_interact)
+        delay_refresh = tuned.get("refresh", delay_refresh)
+    return {
+        'targets': targets,
+        'one_in_chance': 1 / target_odds(targets)[0],
+        'scan_rect': tuple(settings.get("scan_rect", DEFAULT_SCAN)),
+        'btn_yes': tuple(btns.get("yes", DEFAULT_BTN_YES)),
+        'btn_no': tuple(btns.get("no", DEFAULT_BTN_NO)),
+        'delay_interact': delay_interact,
+        'delay_refresh': delay_refresh,
+        'wait_for_change': delays.get("wait_for_change", DEFAULT_WAIT_FOR_CHANGE),
+        'overlap_ocr': delays.get("overlap_ocr", DEFAULT_OVERLAP_OCR),
+        'adaptive_delays': adaptive,
+        'record_dataset': settings.get("record_dataset", DEFAULT_RECORD_DATASET),
+        'roll_history': settings.get("roll_history", DEFAULT_ROLL_HISTORY),
+        'watchdog': settings.get("watchdog", DEFAULT_WATCHDOG),
+        'honey_budget': parse_honey(settings.get("honey_amount", "0")),
+        'focus_point': tuple(settings["focus_point"]) if settings.get("focus_point") else None
+    }
+
+def run_headless(settings_paths=(CONFIG_FILE,), backend=None, source=None, dry_run=False, max_rolls=0, as_json=False,
+                 sim_seed=None, ocr_processes=None):
+    # Rolls with the saved settings and no GUI, printing every event. Ctrl+C stops.
+    # Several settings files roll several game windows at once under a SessionScheduler;
+    # the first one's OCR options are used for all of them. The sim backend rolls
+    # against GameSimulators (seeded sim_seed, sim_seed + 1, ...) and scores every
+    # read against the amulet that was actually drawn. ocr_processes overrides the
+    # settings' count of OCR worker processes.
+    if isinstance(settings_paths, str): settings_paths = [settings_paths]
+    all_settings = [load_settings(path) for path in settings_paths]
+    for path, settings in zip(settings_paths, all_settings):
+        if not settings_targets(settings):
+            print(f"No amulets configured in {path}")
+            return 1
+    settings = all_settings[0]
+    if ocr_processes is None: ocr_processes = settings.get("ocr_processes", DEFAULT_OCR_PROCESSES)
+    if ocr_processes:
+        # The workers load the engine; this process only needs the imports
+        import_runtime()
+        if not as_json: print(f"Starting {ocr_processes} OCR processes...", flush=True)
+        pool = ensure_ocr_pool(ocr_processes, ocr_settings(settings))
+    else:
+        load_runtime(settings.get("ocr_engine", DEFAULT_ENGINE_PROFILE))
+        pool = None
+    apply_ocr_settings(settings)
+    set_staged_read(settings.get("ocr_staged_read", DEFAULT_STAGED_READ))
+    calibrate_odds()
+
+    sims = []
+    if backend == "sim":
+        sims = [GameSimulator.from_settings(s, None if sim_seed is None else sim_seed + i) for i, s in enumerate(all_settings)]
+        captures = [SimCapture(sim) for sim in sims]
+        inputs = [SimInput(sim) for sim in sims]
+    else:
+        captures = [create_capture(backend or s.get("capture_backend", DEFAULT_CAPTURE_BACKEND), source) for s in all_settings]
+        inputs = [NullInput() if dry_run else DirectInput() for _ in all_settings]
+    # Sizes come from the captures so replays and the simulator never ask pyautogui
+    screen_sizes = [capture_session.get_screen_size() for capture_session in captures]
+    configs = []
+    for settings, screen_size in zip(all_settings, screen_sizes):
+        config = roller_config(settings, screen_size)
+        config['max_rolls'] = max_rolls
+        configs.append(config)
+    sim_reads = {"correct": 0, "stale": 0, "misread": 0}
+    if len(configs) == 1:
+        if pool:
+            pool.invalidate_layout()
+            roller = RollerEngine(configs[0], captures[0], inputs[0],
+                                  lambda img, passive_gate=None: pool.read(img, passive_gate, frame_cache))
+        else:
+            roller = RollerEngine(configs[0], captures[0], inputs[0])
+        engines = [roller]
+    else:
+        roller = SessionScheduler(configs, captures, inputs, pool)
+        engines = roller.engines
+
+    def score_sim_read(event):
+        # A read is reported before the next click, so it should show the latest amulet
+        sim = sims[event.get("session", 0)]
+        index, double = sim.latest()
+        # A gated read may have stopped after the passives, so only those are compared
+        def same(amulet):
+            if event.get("gated"): return set(event["passives"]) == set(amulet[0])
+            return same_read((event["passives"], event["stats"]), amulet)
+        if same(sim.amulet(index, double)): return "correct"
+        if index and same(sim.amulet(index - 1, double and index > 1)): return "stale"
+        return "misread"
+
+    def on_event(event):
+        if sims and event["type"] == "read":
+            verdict = event["sim_read"] = score_sim_read(event)
+            sim_reads[verdict] += 1
+        if as_json:
+            print(json.dumps({k: v for k, v in event.items() if k != "exception"}), flush=True)
+            return
+        tag = f"[{event['session'] + 1}] " if "session" in event else ""
+        if event.get("sim_read") == "misread":
+            sim = sims[event.get("session", 0)]
+            print(f"{tag}Misread amulet {sim.latest()[0]} of seed {sim.seed}", flush=True)
+        if event["type"] == "read":
+            stats = ", ".join(f"{k.split('(')[0].strip()} {v}" for k, v in event["stats"].items())
+            print(f"{tag}#{event['roll']} [{', '.join(event['passives'])}] {stats}", flush=True)
+        elif event["type"] in ("log", "error"):
+            print(f"{tag}{event['message']}", flush=True)
+        elif event["type"] == "hit":
+            print(f"{tag}!!! TARGET FOUND (Amulet {', '.join(str(i + 1) for i in event['hits'])}) !!!", flush=True)
+        elif event["type"] == "stopped":
+            print(f"{tag}Stopped ({event['reason']}) after {event['rolls']} rolls", flush=True)
+
+    roller.subscribe(on_event)
+    roller.start()
+    try:
+        while roller.is_running(): roller.join(0.2)
+    except KeyboardInterrupt:
+        roller.stop()
+        roller.join()
+    finally:
+        if len(engines) > 1:
+            rates, total = roller.rolls_per_minute()
+            roller.close()
+            if not as_json:
+                print(f"{total:.1f} rolls/min over {len(engines)} sessions ({', '.join(f'{r:.1f}' for r in rates)})")
+        for capture_session in captures: capture_session.close()
+        if pool: ensure_ocr_pool(0)
+    if sims and not as_json:
+        print(f"Simulator: {sim_reads['correct']} correct, {sim_reads['stale']} stale (delays under the latency), "
+              f"{sim_reads['misread']} misread; {format_large_number(sum(sim.spent for sim in sims))} honey, "
+              f"{sum(sim.ignored_clicks for sim in sims)} clicks ignored")
+
+    for path, settings, engine, screen_size in zip(settings_paths, all_settings, engines, screen_sizes):
+        if engine.tuner and not dry_run:
+            settings.setdefault("delays", {}).setdefault("tuned", {})[screen_key(screen_size)] = {k: round(v, 3) for k, v in engine.tuner.delays.items()}
+            with open(path, 'w') as f: json.dump(settings, f, indent=4)
+    return 0 if any(engine.hits for engine in engines) else 1
+
+def print_odds(settings_path=CONFIG_FILE, history_path=HISTORY_FILE):
+    settings = load_settings(settings_path)
+    targets = settings_targets(settings)
+    used = calibrate_odds(history_path)
+    start = time.perf_counter()
+    info = odds_model.odds(targets)
+    took = (time.perf_counter() - start) * 1000
+    print(f"{len(targets)} targets ({info['targets']} after removing impossible and implied ones), "
+          f"stat values {'calibrated on ' + str(used) + ' rolls' if used else 'uniform'}")
+    if info["p"] <= 0:
+        print("No roll can hit these targets")
+        return
+    error = f" +/- {info['stderr'] / info['p'] * 100:.1f}%" if info["stderr"] else ""
+    print(f"Chance per roll: 1 in {1 / info['p']:,.0f}{error} ({info['method']}, {took:.1f} ms)")
+    for q in (50, 90):
+        seconds = f", {format_time(info[f'seconds_p{q}'])}" if info[f"seconds_p{q}"] else ""
+        print(f"P{q}: {info[f'rolls_p{q}']:,} rolls, {format_large_number(info[f'honey_p{q}'])} honey{seconds}")
+
+def print_history(path=HISTORY_FILE, session=None):
+    if not os.path.exists(path):
+        print(f"No roll history at {path}")
+        return
+    history = RollHistory(path)
+    sessions = history.sessions()
+    if session is None and sessions: session = sessions[-1]["id"]
+    for label, sid in (("All sessions", None), (f"Session {session}", session)):
+        info = history.summary(sid)
+        rate = f", {info['rolls_per_hour']:.0f} rolls/hour" if info["rolls_per_hour"] else ""
+        print(f"{label}: {info['rolls']} rolls, {info['hits']} hits{rate}")
+    print("Passive frequency (all sessions):")
+    for p, freq in history.passive_frequencies().items():
+        print(f"  {p:<16}{freq * 100:6.2f}%")
+    print("Stats (all sessions):       seen   median      p90")
+    for k in STAT_KEYS:
+        vals = history.stat_values(k)
+        vals = vals[~np.isnan(vals)]
+        if vals.size:
+            print(f"  {k.split('(')[0].strip():<22}{vals.size / len(history.stat_values(k)) * 100:6.1f}%{np.median(vals):9.2f}{np.percentile(vals, 90):9.2f}")
+    print(f"Stage p50 ms (session {session}):")
+    for stage in TIMING_STAGES:
+        times = history.stage_times(stage, session)
+        if times.size: print(f"  {stage:<16}{np.median(times):9.2f}")
+
+def main(argv=None):
+    multiprocessing.freeze_support()  # the onefile build starts OCR processes from its own exe
+    parser = argparse.ArgumentParser(description="SSA Auto Roller")
+    parser.add_argument("--bench-pipelines", metavar="DIR",
+                        help="time every OCR pipeline preset over a folder of saved crops (F3 with Debug Logs saves them)")
+    parser.add_argument("--bench", metavar="DIR",
+                        help="replay a recorded dataset (Record Dataset) or crop folder through capture, OCR, parsing and matching")
+    parser.add_argument("--bench-engines", metavar="DIR",
+                        help="compare OCR engine profiles (threads, providers, int8, angle classifier) over a folder of crops")
+    parser.add_argument("--quantize-models", action="store_true",
+                        help=f"write int8 copies of the OCR models to {QUANT_MODELS_DIR} for the int8 engine option")
+    parser.add_argument("--headless", action="store_true",
+                        help="roll with the saved settings and no GUI, printing each roll (Ctrl+C or F2 stops)")
+    parser.add_argument("--settings", action="append",
+                        help="settings file for --headless and --odds (default ssa_settings.json); "
+                             "repeat it to roll one game window per file in parallel")
+    parser.add_argument("--capture", choices=CAPTURE_BACKENDS + ("replay", "sim"),
+                        help="capture backend override for --headless (sim rolls against a simulated game)")
+    parser.add_argument("--source", metavar="DIR", help="frames for the replay capture backend")
+    parser.add_argument("--sim-seed", type=int, help="seed for --capture sim and --sim-export (default: the settings' simulator seed)")
+    parser.add_argument("--sim-export", metavar="DIR",
+                        help="write --max-rolls (default 100) simulated amulet frames with labels.json for the benchmarks")
+    parser.add_argument("--dry-run", action="store_true", help="--headless without sending any input to the game")
+    parser.add_argument("--max-rolls", type=int, default=0, help="stop --headless after this many rolls")
+    parser.add_argument("--json", action="store_true", help="print --headless events as JSON lines")
+    parser.add_argument("--ocr-processes", type=int, metavar="N",
+                        help="OCR worker processes for --headless (default: ocr_processes in the settings, 0 = none)")
+    parser.add_argument("--history", nargs="?", const=HISTORY_FILE, metavar="DB",
+                        help="print aggregates from the roll history (latest session and all sessions)")
+    parser.add_argument("--odds", action="store_true",
+                        help="print the chance per roll and P50/P90 rolls, honey and time for the saved amulets")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="frames per OCR batch for --bench (batch sizes inside come from the engine profile)")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the data for benchmarks")
+    args = parser.parse_args(argv)
+
+
+    if args.history:
+        print_history(args.history)
+        return
+    if args.odds:
+        print_odds((args.settings or [CONFIG_FILE])[0])
+        return
+    if args.headless:
+        sys.exit(run_headless(args.settings or [CONFIG_FILE], args.capture, args.source, args.dry_run, args.max_rolls, args.json,
+                              args.sim_seed, args.ocr_processes))
+    if args.sim_export:
+        import_runtime()
+        settings = load_settings((args.settings or [CONFIG_FILE])[0])
+        sim = GameSimulator.from_settings(settings, args.sim_seed)
+        _, _, w, h = SimCapture(sim).rect_to_pixels(tuple(settings.get("scan_rect", DEFAULT_SCAN)))
+        print(f"Wrote {args.max_rolls or 100} frames to {sim.export(args.sim_export, args.max_rolls or 100, w, h)}")
+        return
+    if args.bench_pipelines or args.bench_engines or args.bench:
+        load_runtime()
+    if args.bench_pipelines:
+        bench_pipelines(args.bench_pipelines, args.repeat, load_settings().get("ocr_pipeline"))
+        return
+    if args.bench_engines:
+        bench_engines(args.bench_engines, args.repeat, load_settings())
+        return
+    if args.quantize_models:
+        quantize_models()
+        return
+    if args.bench:
+        bench_dataset(args.bench, args.repeat, load_settings(), max(1, args.batch))
+        return
+
     root = tk.Tk()
     app = MacroGUI(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import AutoSsaRoller as roller  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def ocr():
+    # The OCR engine, loaded once; tests that read frames are skipped without it
+    pytest.importorskip("cv2")
+    pytest.importorskip("rapidocr_onnxruntime")
+    roller.load_runtime()
+    return roller
+
+
+@pytest.fixture
+def ocr_options(ocr):
+    # Puts the module-wide OCR switches back after a test changes them
+    yield ocr
+    ocr.set_layout_cache(ocr.DEFAULT_LAYOUT_CACHE)
+    ocr.set_staged_read(ocr.DEFAULT_STAGED_READ)
+    ocr.frame_cache.clear()
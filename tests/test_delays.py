@@ -0,0 +1,50 @@
+import pytest
+
+from AutoSsaRoller import DELAY_BACKOFF, DELAY_FLOOR_DECAY, DELAY_SHRINK, DELAY_SHRINK_AFTER, DelayTuner
+
+STATS = {"Pollen (8 - 20)": 10.0, "Red Pollen (15 - 70)": 40.0}
+
+
+def clean_rolls(tuner, n, start=0):
+    for i in range(start, start + n):
+        assert tuner.observe(i, ["Pop Star"], STATS) is None
+
+
+def test_shrinks_after_clean_rolls_taking_turns():
+    tuner = DelayTuner(0.6, 0.8)
+    clean_rolls(tuner, DELAY_SHRINK_AFTER)
+    assert tuner.interact == pytest.approx(0.6 * DELAY_SHRINK)
+    assert tuner.refresh == 0.8
+    clean_rolls(tuner, DELAY_SHRINK_AFTER, DELAY_SHRINK_AFTER)
+    assert tuner.refresh == pytest.approx(0.8 * DELAY_SHRINK)
+
+
+def test_empty_read_backs_off_interact():
+    tuner = DelayTuner(0.6, 0.8)
+    assert tuner.observe(1, [], {}) == "interact"
+    assert tuner.interact == pytest.approx(0.6 * DELAY_BACKOFF)
+
+
+def test_same_frame_backs_off_refresh():
+    tuner = DelayTuner(0.6, 0.8)
+    clean_rolls(tuner, 1)
+    assert tuner.observe(0, ["Pop Star"], STATS) == "refresh"
+    assert tuner.refresh == pytest.approx(0.8 * DELAY_BACKOFF)
+
+
+def test_missing_lines_back_off_refresh_unless_gated():
+    tuner = DelayTuner(0.6, 0.8)
+    clean_rolls(tuner, 1)
+    # A gated read skipped the stats on purpose
+    assert tuner.observe(1, ["Star Saw"], {}, gated=True) is None
+    assert tuner.observe(2, ["Star Saw"], {"Pollen (8 - 20)": 10.0}) == "refresh"
+
+
+def test_floor_stops_shrinking_below_a_failure():
+    tuner = DelayTuner(0.6, 0.8)
+    tuner.observe(0, [], {})
+    floor = tuner.floors["interact"]
+    for block in range(5):
+        clean_rolls(tuner, 2 * DELAY_SHRINK_AFTER, 1 + block * 2 * DELAY_SHRINK_AFTER)
+    # Five interact shrinks: the floor only decays slowly
+    assert tuner.interact == pytest.approx(floor * DELAY_FLOOR_DECAY ** 5)
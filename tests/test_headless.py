@@ -0,0 +1,70 @@
+# --headless, --sim-export and replays in a fresh process with the Windows-only input
+# libraries blocked, so these paths can't start needing them again unnoticed
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+INPUT_MODULES = ("pyautogui", "pydirectinput", "keyboard")
+ROLLS = 5
+SCRIPT = (f"import sys\n"
+          f"for name in {INPUT_MODULES!r}: sys.modules[name] = None\n"
+          f"sys.path.insert(0, {ROOT!r})\n"
+          f"import AutoSsaRoller\n"
+          f"AutoSsaRoller.main(sys.argv[1:])\n")
+# Adaptive delays are on to cover the per-resolution delay lookup
+SETTINGS = {"delays": {"interact": 0.05, "refresh": 0.05, "adaptive": True}, "roll_history": False,
+            "ocr_processes": 0, "simulator": {"seed": 1, "latency": 0.02},
+            "amulets": [{"passives": ["Guiding Star", "Pop Star"], "stats": {"Pollen (8 - 20)": 20}}]}
+
+
+@pytest.fixture
+def folder(ocr, tmp_path):
+    with open(tmp_path / "ssa_settings.json", 'w') as f: json.dump(SETTINGS, f)
+    return tmp_path
+
+
+def run(folder, *args):
+    proc = subprocess.run([sys.executable, "-c", SCRIPT, *args], cwd=folder, capture_output=True, text=True,
+                          timeout=300)
+    events = []
+    for line in proc.stdout.splitlines():
+        try: events.append(json.loads(line))
+        except ValueError: pass
+    return proc, events
+
+
+def check_run(proc, events):
+    assert not [e for e in events if e["type"] == "error"]
+    assert any(e["type"] == "stopped" for e in events), proc.stderr
+    reads = [e for e in events if e["type"] == "read"]
+    assert len(reads) == ROLLS
+    return reads
+
+
+def test_sim(folder):
+    reads = check_run(*run(folder, "--headless", "--capture", "sim", "--json", "--max-rolls", str(ROLLS)))
+    assert [e["sim_read"] for e in reads] == ["correct"] * ROLLS
+
+
+def test_replay_of_exported_frames(folder):
+    proc, _ = run(folder, "--sim-export", "frames", "--max-rolls", str(ROLLS))
+    assert proc.returncode == 0, proc.stderr
+    assert os.path.exists(folder / "frames" / "labels.json")
+    check_run(*run(folder, "--headless", "--capture", "replay", "--source", "frames", "--dry-run", "--json",
+                   "--max-rolls", str(ROLLS)))
+
+
+def test_sim_gated(folder):
+    # Reading passives first, most rolls stop before their stats; those are scored on
+    # their passives only
+    with open(folder / "gated.json", 'w') as f:
+        json.dump({**SETTINGS, "ocr_layout_cache": True, "ocr_staged_read": True}, f)
+    reads = check_run(*run(folder, "--headless", "--settings", "gated.json", "--capture", "sim", "--json",
+                           "--max-rolls", str(ROLLS)))
+    assert any(e["gated"] for e in reads)
+    assert [e["sim_read"] for e in reads] == ["correct"] * ROLLS
@@ -0,0 +1,75 @@
+import math
+
+import numpy as np
+
+from AutoSsaRoller import STAT_KEYS, TargetMatcher, passive_mask
+
+POLLEN = "Pollen (8 - 20)"
+RED = "Red Pollen (15 - 70)"
+RATE = "Convert Rate (1.05 - 1.25)"
+
+
+def test_threshold_is_inclusive():
+    matcher = TargetMatcher([{"passives": [], "stats": {POLLEN: 18}}])
+    assert list(matcher.match_all([], {POLLEN: 18.0})) == [0]
+    assert list(matcher.match_all([], {POLLEN: 17.0})) == []
+
+
+def test_zero_minimum_only_needs_the_stat():
+    matcher = TargetMatcher([{"passives": [], "stats": {RED: 0}}])
+    assert list(matcher.match_all([], {RED: 15.0})) == [0]
+    assert list(matcher.match_all([], {POLLEN: 20.0})) == []
+
+
+def test_decimal_threshold():
+    matcher = TargetMatcher([{"passives": [], "stats": {RATE: 1.2}}])
+    assert list(matcher.match_all([], {RATE: 1.2})) == [0]
+    assert list(matcher.match_all([], {RATE: 1.19})) == []
+
+
+def test_every_wanted_passive_and_stat():
+    matcher = TargetMatcher([{"passives": ["Pop Star", "Star Saw"], "stats": {POLLEN: 10, RED: 40}}])
+    stats = {POLLEN: 12.0, RED: 41.0}
+    assert list(matcher.match_all(["Star Saw", "Pop Star"], stats)) == [0]
+    assert list(matcher.match_all(["Pop Star"], stats)) == []
+    assert list(matcher.match_all(["Pop Star", "Star Saw"], {POLLEN: 12.0})) == []
+
+
+def test_reports_every_hit():
+    matcher = TargetMatcher([{"passives": ["Pop Star"], "stats": {}},
+                             {"passives": [], "stats": {POLLEN: 15}},
+                             {"passives": ["Guiding Star"], "stats": {}}])
+    assert list(matcher.match_all(["Pop Star"], {POLLEN: 16.0})) == [0, 1]
+
+
+def test_unknown_names_never_match():
+    matcher = TargetMatcher([{"passives": ["Not A Passive"], "stats": {}},
+                             {"passives": [], "stats": {"Not A Stat": 1}}])
+    assert not matcher.possible.any()
+    assert list(matcher.match_all(["Pop Star"], {POLLEN: 20.0})) == []
+    assert not matcher.passives_can_match(["Pop Star"])
+
+
+def test_match_batch_agrees_with_match_all():
+    targets = [{"passives": ["Pop Star"], "stats": {POLLEN: 15}},
+               {"passives": [], "stats": {RED: 50, RATE: 1.1}}]
+    matcher = TargetMatcher(targets)
+    rolls = [(["Pop Star"], {POLLEN: 15.0}),
+             (["Pop Star"], {POLLEN: 14.0, RED: 60.0, RATE: 1.1}),
+             (["Star Saw"], {RED: 49.0, RATE: 1.2}),
+             ([], {})]
+    values = np.full((len(rolls), len(STAT_KEYS)), math.nan)
+    for i, (_, stats) in enumerate(rolls):
+        for k, v in stats.items(): values[i, STAT_KEYS.index(k)] = v
+    batch = matcher.match_batch([passive_mask(p) for p, _ in rolls], values)
+    for row, (passives, stats) in zip(batch, rolls):
+        assert list(np.flatnonzero(row)) == list(matcher.match_all(passives, stats))
+
+
+def test_passive_gate():
+    matcher = TargetMatcher([{"passives": ["Pop Star"], "stats": {POLLEN: 15}},
+                             {"passives": ["Guiding Star", "Star Saw"], "stats": {}}])
+    assert matcher.passives_can_match(["Pop Star"])
+    assert matcher.passives_can_match(["Star Saw", "Guiding Star"])
+    assert not matcher.passives_can_match(["Star Saw"])
+    assert not matcher.passives_can_match([])
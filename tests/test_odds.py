@@ -0,0 +1,46 @@
+import math
+
+import pytest
+
+from AutoSsaRoller import ODDS_MC_SEED, GameSimulator, OddsModel, TargetMatcher
+
+SIM_ROLLS = 20_000
+
+# (targets, double roll); thresholds at a stat's maximum included
+CASES = {
+    "pollen_20": ([{"passives": [], "stats": {"Pollen (8 - 20)": 20}}], False),
+    "pollen_19": ([{"passives": [], "stats": {"Pollen (8 - 20)": 19}}], False),
+    "crit_7": ([{"passives": [], "stats": {"Critical Chance (2 - 7)": 7}}], False),
+    "convert_rate_1.20": ([{"passives": [], "stats": {"Convert Rate (1.05 - 1.25)": 1.2}}], False),
+    "overlapping": ([{"passives": ["Pop Star"], "stats": {"Pollen (8 - 20)": 18}},
+                     {"passives": ["Guiding Star", "Star Saw"], "stats": {}}], True),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_odds_match_the_simulator(name):
+    targets, double = CASES[name]
+    sim = GameSimulator(seed=ODDS_MC_SEED)
+    matcher = TargetMatcher(targets)
+    seen = sum(len(matcher.match_all(*sim.amulet(i, double))) > 0 for i in range(SIM_ROLLS)) / SIM_ROLLS
+    model = OddsModel()
+    slots = 2 if double else 1
+    exact = model.exact(matcher, slots)
+    mc, mc_err = model.monte_carlo(matcher, slots)
+    for p, err in ((exact, 0.0), (mc, mc_err)):
+        # Within 4 standard errors of the simulated frequency
+        assert abs(p - seen) <= 4 * math.sqrt(p * (1 - p) / SIM_ROLLS + err ** 2), (p, seen)
+
+
+def test_maximum_is_reachable():
+    info = OddsModel().odds([{"passives": [], "stats": {"Pollen (8 - 20)": 20}}])
+    assert info["targets"] == 1
+    assert info["p"] > 0
+
+
+def test_live_budget_is_cached_separately():
+    targets = [{"passives": [], "stats": {"Pollen (8 - 20)": 12, "Red Pollen (15 - 70)": 30}}]
+    model = OddsModel()
+    model.odds(targets, samples=1000)
+    model.odds(targets)
+    assert len(model.cache) == 2
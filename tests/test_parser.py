@@ -0,0 +1,32 @@
+import pytest
+
+from AutoSsaRoller import StatParser
+
+CASES = [
+    # Two passives the OCR merged into one line
+    ("Gummy Star Star Saw", ["Gummy Star", "Star Saw"], {}),
+    ("Scorching Star Star Shower\n+45% Red Pollen", ["Scorching Star", "Star Shower"], {"Red Pollen (15 - 70)": 45.0}),
+    # Passives merged into a stat line, before and after it
+    ("Pop Star +45% White Pollen", ["Pop Star"], {"White Pollen (15 - 70)": 45.0}),
+    ("+45% White Pollen Pop Star", ["Pop Star"], {"White Pollen (15 - 70)": 45.0}),
+    # A decimal point the OCR made up, and one it dropped
+    ("+4.5% White Pollen", [], {"White Pollen (15 - 70)": 45.0}),
+    ("+9% lnstant Conversion\nx118 Convert Rate", [],
+     {"Instant Conversion (5 - 12)": 9.0, "Convert Rate (1.05 - 1.25)": 1.18}),
+    ("Gumy Star", ["Gummy Star"], {}),
+    ("Pop Star\n+20% Pollen\nx1.2 Convert Rate", ["Pop Star"],
+     {"Pollen (8 - 20)": 20.0, "Convert Rate (1.05 - 1.25)": 1.2}),
+    ("Guiding Star\n+45% Rd Pollen", ["Guiding Star"], {"Red Pollen (15 - 70)": 45.0}),
+]
+
+
+@pytest.mark.parametrize("text, passives, stats", CASES)
+def test_parse(text, passives, stats):
+    assert StatParser().parse(text) == (passives, stats)
+
+
+def test_doubts_out_of_range_and_unsure_lines():
+    lines = [(None, "Pop Star", 0.99), (None, "+95% Red Pollen", 0.99), (None, "+30% Blue Pollen", 0.5)]
+    _, stats, doubts = StatParser().parse_lines(lines)
+    assert doubts == [1, 2]
+    assert stats["Blue Pollen (15 - 70)"] == 30.0
@@ -0,0 +1,85 @@
+import pytest
+
+import AutoSsaRoller as roller
+from AutoSsaRoller import DEFAULT_SCAN, GameSimulator, LayoutCache, SimCapture, SimInput, TargetMatcher
+
+
+@pytest.fixture
+def sim():
+    return GameSimulator(seed=1)
+
+
+def frame(sim, index):
+    _, _, w, h = SimCapture(sim).rect_to_pixels(DEFAULT_SCAN)
+    return sim.draw(index, False, w, h)
+
+
+def never(passives):
+    return False
+
+
+def always(passives):
+    return True
+
+
+def test_layout_cache_serves_later_rolls(ocr_options, sim):
+    ocr_options.set_layout_cache(True)
+    layout = LayoutCache()
+    for index in range(1, 4):
+        _, passives, stats = roller.read_image(frame(sim, index), layout=layout)
+        assert (passives, stats) == sim.amulet(index)
+    assert layout.detections == 1
+    assert layout.hits == 2
+
+
+def test_gate_stops_after_the_passives(ocr_options, sim):
+    ocr_options.set_layout_cache(True)
+    ocr_options.set_staged_read(True)
+    layout = LayoutCache()
+    roller.read_image(frame(sim, 1), layout=layout)
+    _, passives, stats = roller.read_image(frame(sim, 2), never, layout)
+    assert passives == sim.amulet(2)[0]
+    assert stats == {}
+    _, passives, stats = roller.read_image(frame(sim, 3), always, layout)
+    assert (passives, stats) == sim.amulet(3)
+
+
+def test_gate_needs_a_cached_layout(ocr_options, sim):
+    # Without a layout there is no telling passive lines from stat lines yet
+    ocr_options.set_layout_cache(True)
+    ocr_options.set_staged_read(True)
+    _, passives, stats = roller.read_image(frame(sim, 1), never, LayoutCache())
+    assert (passives, stats) == sim.amulet(1)
+
+
+def test_gated_reads_are_cached_apart(ocr_options, sim):
+    ocr_options.set_layout_cache(True)
+    ocr_options.set_staged_read(True)
+    cache = roller.FrameResultCache()
+    roller.read_frame(frame(sim, 1), cache=cache)
+    img = frame(sim, 2)
+    assert roller.read_frame(img, never, cache)[2] == {}
+    assert roller.read_frame(img, cache=cache)[1:] == sim.amulet(2)
+
+
+def test_roller_flags_gated_reads(ocr_options, sim):
+    ocr_options.set_layout_cache(True)
+    ocr_options.set_staged_read(True)
+    targets = [{"passives": ["Guiding Star", "Pop Star"], "stats": {"Pollen (8 - 20)": 20}}]
+    settings = {"delays": {"interact": 0.05, "refresh": 0.05}, "amulets": targets, "roll_history": False}
+    config = roller.roller_config(settings, sim.screen)
+    config["max_rolls"] = 6
+    sim.latency = 0.02
+    engine = roller.RollerEngine(config, SimCapture(sim), SimInput(sim))
+    reads = []
+    engine.subscribe(lambda event: event["type"] == "read" and reads.append(event))
+    engine.start()
+    engine.join()
+    matcher = TargetMatcher(targets)
+    assert len(reads) == 6
+    assert any(read["gated"] for read in reads)
+    for read in reads:
+        # The first roll is read whole while the layout is learnt, gated or not
+        assert read["gated"] == (not matcher.passives_can_match(read["passives"]))
+        if read["gated"] and read["roll"] > 1: assert read["stats"] == {}
+        else: assert len(read["stats"]) == roller.STAT_SLOTS